@@ -5,69 +5,241 @@
 # ------------------------------
 # Controls all paths and parameters for the RAG preprocessing pipeline.
 # Keeps everything reproducible and centralized via pathlib + .env.
+#
+# Nothing is read, checked or created at import time. Environment-backed
+# settings live on `settings` (a Settings instance) and are resolved and
+# validated the first time they are used, so local-only stages start
+# instantly and run without crawler credentials. `from config import X`
+# keeps working: module attributes are looked up on `settings` on demand.
+# Resolving a path never creates it; each stage makes the directories it
+# writes to, so `--help` or a failed start leaves the output tree alone.
 # ------------------------------
 
 import os
+from functools import cached_property
 from pathlib import Path
-from dotenv import load_dotenv
 
-# Load environment variables from .env file (if it exists)
-load_dotenv()
+# === Chunking Parameters ===
 
-# === Base Project Paths ===
+TARGET_TOKENS = 1000
+OVERLAP_TOKENS = 200
 
-REPO_ROOT = Path(os.environ.get("REPO_ROOT", Path.home() / "Desktop" / "clean-gpt-json"))
-OUTPUT_ROOT = Path(os.environ.get("OUTPUT_ROOT", Path.home() / "Desktop" / "doc-lib"))
-INGESTION_SOURCE = REPO_ROOT / "ingestion_source"
+# === PDF Pre-Check ===
 
-# Sanity checks for the directory paths
-if not REPO_ROOT.exists():
-    raise FileNotFoundError(f"REPO_ROOT does not exist: {REPO_ROOT}")
-if not OUTPUT_ROOT.exists():
-    OUTPUT_ROOT.mkdir(parents=True)
+PRECHECK_SAMPLE_PAGES = 8  # Pages sampled per PDF by analyze_pdf_folder.py --fast
 
-# === Chunking Parameters ===
+# === OCR (optional, needs a local Tesseract install) ===
 
-TARGET_TOKENS = 1000
-OVERLAP_TOKENS = 200
+OCR_DPI = 300
+
+# === Apify Crawling ===
+
+# Dataset download: items per page request and pages fetched in parallel
+DATASET_PAGE_SIZE = 5000
+DATASET_DOWNLOAD_WORKERS = 4
+
+# Run polling: first delay, cap for the exponential backoff, and how many
+# actor runs a batch crawl (ragformatter.py --batch) keeps in flight
+POLL_INITIAL_SECS = 2
+POLL_MAX_SECS = 60
+MAX_CONCURRENT_RUNS = 10
+
+# Seconds Apify holds each status request open waiting for the run to end
+# (waitForFinish, server max 60; 0 = plain polling), and how long to wait
+# for a run overall before giving up (0 = no limit)
+POLL_WAIT_SECS = 60
+POLL_DEADLINE_SECS = 24 * 3600
+
+# === Per-Stage Requirements ===
+
+# Settings each stage needs, keyed by ragfmt command; every stage's main()
+# calls settings.require(stage) first so a misconfigured run fails before
+# doing any work. Only "crawl" needs Apify credentials.
+STAGE_REQUIREMENTS = {
+    "crawl": ("APIFY_TOKEN", "APIFY_API_BASE", "INGESTION_SOURCE"),
+    "precheck": ("INGESTION_SOURCE", "OUTPUT_ROOT"),
+    "normalize": ("INGESTION_SOURCE",),
+    "ingest": ("INGESTION_SOURCE", "OUTPUT_ROOT", "TOKENIZER"),
+    "ocr": ("OUTPUT_ROOT", "OCR_LANGUAGE", "TOKENIZER"),
+    "clean": ("OUTPUT_ROOT",),
+    "filter": ("OUTPUT_ROOT", "JUNK_PATTERNS_FILE"),
+    "split": ("OUTPUT_ROOT", "TOKENIZER"),
+    "split-customgpt": ("OUTPUT_ROOT",),
+    "process": ("OUTPUT_ROOT", "TOKENIZER"),
+    "check": ("OUTPUT_ROOT", "TOKENIZER"),
+    "validate": ("OUTPUT_ROOT",),
+    "titles": ("OUTPUT_ROOT",),
+}
+
+_dotenv_loaded = False
+
+# Load environment variables from .env file (if it exists), once
+def _load_dotenv():
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _dotenv_loaded = True
+
+def _env(name: str, default=None):
+    _load_dotenv()
+    return os.environ.get(name, default)
+
+class Settings:
+    """Environment-backed pipeline settings, resolved and validated on first access."""
+
+    # === Base Project Paths ===
+
+    @cached_property
+    def REPO_ROOT(self) -> Path:
+        root = Path(_env("REPO_ROOT", Path.home() / "Desktop" / "clean-gpt-json"))
+        if not root.exists():
+            raise FileNotFoundError(f"REPO_ROOT does not exist: {root}")
+        return root
+
+    @cached_property
+    def OUTPUT_ROOT(self) -> Path:
+        return Path(_env("OUTPUT_ROOT", Path.home() / "Desktop" / "doc-lib"))
+
+    @property
+    def INGESTION_SOURCE(self) -> Path:
+        return self.REPO_ROOT / "ingestion_source"
+
+    # Token counter used to size chunks (see scripts/token_counter.py):
+    # "whitespace", "tiktoken:<encoding>" or "file:<path/to/tokenizer.json>"
+    @cached_property
+    def TOKENIZER(self) -> str:
+        spec = _env("TOKENIZER", "tiktoken:cl100k_base")
+        if spec != "whitespace" and not spec.startswith(("tiktoken:", "file:")):
+            raise ValueError(f"Unknown TOKENIZER: {spec!r} (expected whitespace, tiktoken:<enc> or file:<path>)")
+        return spec
+
+    # === Output File Paths ===
 
-# === Output File Paths ===
+    @property
+    def FULL_OUTPUT_FILE(self) -> Path:
+        return self.OUTPUT_ROOT / "full/unified.json"
 
-FULL_OUTPUT_FILE = OUTPUT_ROOT / "full/unified.json"
-CLEAN_FULL_OUTPUT_FILE = OUTPUT_ROOT / "full/unified-clean.json"
-SPLIT_DIR = OUTPUT_ROOT / "split"
-FILTER_INPUT_FILE = CLEAN_FULL_OUTPUT_FILE
+    @property
+    def FULL_OUTPUT_NDJSON(self) -> Path:
+        return self.OUTPUT_ROOT / "full/unified.ndjson"  # Streamed per-file by smart_ingest
 
-# === Markdown Injection Paths ===
+    @property
+    def INGEST_CACHE_DIR(self) -> Path:
+        return self.OUTPUT_ROOT / "full/.ingest_cache"  # Per-file chunk cache + manifest for incremental runs
 
-MARKDOWN_FOLDER = REPO_ROOT / "markdown" / "raw"
-MARKDOWN_OUTPUT_FOLDER = REPO_ROOT / "markdown" / "with_titles"
-CSV_PATH = REPO_ROOT / "markdown" / "urls.csv"
+    @property
+    def PRECHECK_CACHE_DIR(self) -> Path:
+        return self.OUTPUT_ROOT / "full/.precheck_cache"  # PDF pre-check results keyed by file hash
 
-# === JSON Title Injection ===
+    @property
+    def PDF_PAGE_INDEX(self) -> Path:
+        return self.OUTPUT_ROOT / "full/pdf_page_index.json"  # Per-page text/image/empty states (precheck --index)
 
-JSON_INPUT_DIR = SPLIT_DIR
-JSON_OUTPUT_DIR = SPLIT_DIR
+    @property
+    def OCR_QUEUE_FILE(self) -> Path:
+        return self.OUTPUT_ROOT / "full/ocr_queue.ndjson"  # Image-only PDF pages awaiting OCR
 
-# === Apify Credentials ===
+    @property
+    def OCR_OUTPUT_NDJSON(self) -> Path:
+        return self.OUTPUT_ROOT / "full/ocr.ndjson"  # Chunks from OCR'd pages (scripts/ocr_pages.py)
 
-APIFY_TOKEN = os.getenv("APIFY_TOKEN")
+    @property
+    def CLEAN_FULL_OUTPUT_FILE(self) -> Path:
+        return self.OUTPUT_ROOT / "full/unified-clean.json"
 
-if not APIFY_TOKEN:
-    raise ValueError("Missing APIFY_TOKEN in environment")
+    @property
+    def SPLIT_DIR(self) -> Path:
+        return self.OUTPUT_ROOT / "split"
 
-# === Logging Configuration ===
+    @property
+    def FILTER_INPUT_FILE(self) -> Path:
+        return self.CLEAN_FULL_OUTPUT_FILE
 
-# Log directory and file inside the repo
-LOGS_DIR = REPO_ROOT / "logs"
-LOG_FILE = LOGS_DIR / "pipeline_log.txt"
+    # === OCR ===
 
-# Ensure the logs directory exists
-LOGS_DIR.mkdir(parents=True, exist_ok=True)
+    @cached_property
+    def OCR_LANGUAGE(self) -> str:
+        return _env("OCR_LANGUAGE", "eng")
+
+    # === Filtering ===
+
+    @property
+    def JUNK_PATTERNS_FILE(self) -> Path:
+        return self.REPO_ROOT / "junk_patterns.txt"  # One regex per line; falls back to filter_chunks.JUNK_PATTERNS
+
+    # === Markdown Injection Paths ===
+
+    @property
+    def MARKDOWN_FOLDER(self) -> Path:
+        return self.REPO_ROOT / "markdown" / "raw"
+
+    @property
+    def MARKDOWN_OUTPUT_FOLDER(self) -> Path:
+        return self.REPO_ROOT / "markdown" / "with_titles"
+
+    @property
+    def CSV_PATH(self) -> Path:
+        return self.REPO_ROOT / "markdown" / "urls.csv"
+
+    # === JSON Title Injection ===
+
+    @property
+    def JSON_INPUT_DIR(self) -> Path:
+        return self.SPLIT_DIR
+
+    @property
+    def JSON_OUTPUT_DIR(self) -> Path:
+        return self.SPLIT_DIR
+
+    # === Benchmarks ===
+
+    @property
+    def BENCH_BASELINE_FILE(self) -> Path:
+        return self.REPO_ROOT / "benchmarks" / "baseline.json"  # Written by `ragfmt bench --save-baseline`
+
+    # === Apify Credentials ===
+
+    @cached_property
+    def APIFY_TOKEN(self) -> str:
+        token = _env("APIFY_TOKEN")
+        if not token:
+            raise ValueError("Missing APIFY_TOKEN in environment")
+        return token
+
+    @cached_property
+    def APIFY_API_BASE(self) -> str:
+        return _env("APIFY_API_BASE", "https://api.apify.com/v2")  # Override to point at a local stand-in
+
+    # === Logging Configuration ===
+
+    # Log directory and file inside the repo
+    @property
+    def LOGS_DIR(self) -> Path:
+        return self.REPO_ROOT / "logs"
+
+    @property
+    def LOG_FILE(self) -> Path:
+        return self.LOGS_DIR / "pipeline_log.txt"
+
+    # Resolve (and so validate) every setting a stage depends on
+    def require(self, stage: str):
+        if stage not in STAGE_REQUIREMENTS:
+            raise KeyError(f"Unknown stage: {stage!r} (expected one of {', '.join(STAGE_REQUIREMENTS)})")
+        for name in STAGE_REQUIREMENTS[stage]:
+            getattr(self, name)
+
+settings = Settings()
+
+# `from config import SPLIT_DIR` / `config.SPLIT_DIR` resolve through `settings`
+def __getattr__(name: str):
+    if name.isupper() and isinstance(getattr(Settings, name, None), (property, cached_property)):
+        return getattr(settings, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Logging configuration
 # ----------------------------------------------
-# You can change the logging level to control 
+# You can change the logging level to control
 # the verbosity of logs. Here's a list of available levels:
 #
 # - logging.DEBUG: Logs everything, including debug-level details.
@@ -89,10 +261,10 @@ LOGS_DIR.mkdir(parents=True, exist_ok=True)
 
 def setup_logging():
     import logging
+    # Ensure the logs directory exists
+    settings.LOGS_DIR.mkdir(parents=True, exist_ok=True)
     logging.basicConfig(
-        filename=LOG_FILE,  # Log file inside the repo
+        filename=settings.LOG_FILE,  # Log file inside the repo
         level=logging.INFO,  # Change the levels listed above here
         format='%(asctime)s - %(message)s'  # Log format with timestamp
     )
-
-
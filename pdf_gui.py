@@ -2,16 +2,20 @@
 import os
 import sys
 import json
+import queue
 import threading
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
-import importlib.util
 
-# Import analyze_pdf_folder.py dynamically
-SCRIPT_PATH = os.path.join(os.path.dirname(__file__), "scripts", "analyze_pdf_folder.py")
-spec = importlib.util.spec_from_file_location("analyze_pdf_folder", SCRIPT_PATH)
-analyze_pdf_folder = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(analyze_pdf_folder)
+# Import analyze_pdf_folder.py as a regular module so worker processes can unpickle its tasks
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+import analyze_pdf_folder
+
+# How often (ms) the Tk loop drains the results queue, and how many results per drain
+POLL_MS = 100
+MAX_RESULTS_PER_POLL = 200
+
+COLUMNS = ("filename", "pages", "text_pages", "image_only")
 
 class PDFAnalyzerApp:
     def __init__(self, root):
@@ -21,8 +25,15 @@ class PDFAnalyzerApp:
         self.pdf_dir = tk.StringVar()
         self.output_path = tk.StringVar()
         self.filter_images_only = tk.BooleanVar()
+        self.fast_mode = tk.BooleanVar(value=True)
+        self.status = tk.StringVar(value="Idle")
         self.results = []
 
+        # Scan state: only the worker thread writes to the queue, only Tk reads it
+        self.scan_thread = None
+        self.scan_queue = None
+        self.cancel_event = None
+
         self.build_ui()
 
     def build_ui(self):
@@ -38,14 +49,24 @@ class PDFAnalyzerApp:
         ttk.Button(frm, text="Choose File", command=self.pick_output_file).grid(row=1, column=2)
 
         ttk.Checkbutton(frm, text="Only show image-only PDFs", variable=self.filter_images_only, command=self.refresh_table).grid(row=2, column=1, sticky="w", pady=4)
+        ttk.Checkbutton(frm, text="Fast scan (sample pages)", variable=self.fast_mode).grid(row=3, column=1, sticky="w")
+
+        buttons = ttk.Frame(frm)
+        buttons.grid(row=4, column=1, pady=10)
+        self.run_button = ttk.Button(buttons, text="Run Scan", command=self.start_scan)
+        self.run_button.grid(row=0, column=0, padx=4)
+        self.cancel_button = ttk.Button(buttons, text="Cancel", command=self.cancel_scan, state="disabled")
+        self.cancel_button.grid(row=0, column=1, padx=4)
 
-        ttk.Button(frm, text="Run Scan", command=self.start_scan).grid(row=3, column=1, pady=10)
+        self.progress = ttk.Progressbar(frm, mode="determinate")
+        self.progress.grid(row=5, column=0, columnspan=3, sticky="ew")
+        ttk.Label(frm, textvariable=self.status).grid(row=6, column=0, columnspan=3, sticky="w")
 
         # Treeview for results
-        self.tree = ttk.Treeview(frm, columns=("file", "pages", "text_pages", "image_only"), show="headings", height=12)
+        self.tree = ttk.Treeview(frm, columns=COLUMNS, show="headings", height=12)
         for col in self.tree["columns"]:
             self.tree.heading(col, text=col)
-        self.tree.grid(row=4, column=0, columnspan=3, sticky="nsew")
+        self.tree.grid(row=7, column=0, columnspan=3, sticky="nsew")
 
         self.root.grid_rowconfigure(0, weight=1)
         self.root.grid_columnconfigure(0, weight=1)
@@ -64,34 +85,100 @@ class PDFAnalyzerApp:
         if not self.pdf_dir.get():
             messagebox.showerror("Error", "Please select a folder of PDFs.")
             return
-        threading.Thread(target=self.run_scan).start()
+        if self.scan_thread and self.scan_thread.is_alive():
+            return
 
-    def run_scan(self):
-        self.results = analyze_pdf_folder.analyze_folder(self.pdf_dir.get())
+        self.results = []
         self.refresh_table()
+        self.progress.configure(value=0, maximum=1)
+        self.status.set("Scanning...")
+        self.run_button.configure(state="disabled")
+        self.cancel_button.configure(state="normal")
+
+        # The worker thread runs the process-pool scan and only talks to the queue;
+        # every Tk update happens in poll_queue on the main thread
+        self.scan_queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        sample_pages = analyze_pdf_folder.PRECHECK_SAMPLE_PAGES if self.fast_mode.get() else 0
+        self.scan_thread = threading.Thread(
+            target=analyze_pdf_folder.analyze_folder,
+            args=(self.pdf_dir.get(),),
+            kwargs={"result_queue": self.scan_queue, "cancel": self.cancel_event, "sample_pages": sample_pages},
+            daemon=True
+        )
+        self.scan_thread.start()
+        self.root.after(POLL_MS, self.poll_queue)
+
+    def cancel_scan(self):
+        if self.cancel_event:
+            self.cancel_event.set()
+            self.status.set("Cancelling...")
+            self.cancel_button.configure(state="disabled")
+
+    # Drain a bounded batch of scan events, then reschedule until the scan is done
+    def poll_queue(self):
+        for _ in range(MAX_RESULTS_PER_POLL):
+            try:
+                kind, payload = self.scan_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "start":
+                self.progress.configure(maximum=max(1, payload))
+                self.status.set(f"Scanning {payload} PDF(s)...")
+            elif kind == "result":
+                item = self.to_row(payload)
+                self.results.append(item)
+                self.insert_row(item)
+                self.progress.step(1)
+                self.status.set(f"Scanned {len(self.results)} of {int(self.progress['maximum'])} PDF(s)")
+            elif kind == "error":
+                messagebox.showerror("Error", f"Scan failed: {payload}")
+            elif kind == "done":
+                self.finish_scan()
+                return
+
+        self.root.after(POLL_MS, self.poll_queue)
+
+    def finish_scan(self):
+        cancelled = self.cancel_event.is_set()
+        total = int(self.progress["maximum"])
+        self.status.set(f"{'Cancelled' if cancelled else 'Done'}: {len(self.results)} of {total} PDF(s) scanned")
+        self.run_button.configure(state="normal")
+        self.cancel_button.configure(state="disabled")
         if self.output_path.get():
             self.save_results()
 
+    # Shape an analyzer result for the table / saved output
+    @staticmethod
+    def to_row(result: dict) -> dict:
+        return {
+            "filename": result.get("filename"),
+            "pages": result.get("pages", 0),
+            "text_pages": result.get("text_pages", 0),
+            "image_only": result.get("pages", 0) > 0 and result.get("text_pages", 0) == 0,
+            "ratio": result.get("ratio", 0.0),
+            "error": result.get("error")
+        }
+
+    def insert_row(self, item: dict):
+        if self.filter_images_only.get() and not item.get("image_only"):
+            return
+        self.tree.insert("", "end", values=tuple(item.get(col) for col in COLUMNS))
+
     def refresh_table(self):
         for i in self.tree.get_children():
             self.tree.delete(i)
 
         for item in self.results:
-            if self.filter_images_only.get() and not item.get("image_only"):
-                continue
-            self.tree.insert("", "end", values=(
-                item.get("filename"),
-                item.get("total_pages"),
-                item.get("text_pages"),
-                item.get("image_only")
-            ))
+            self.insert_row(item)
 
     def save_results(self):
         try:
-            with open(self.output_path.get(), "w") as f:
+            with open(self.output_path.get(), "w", newline="") as f:
                 if self.output_path.get().endswith(".csv"):
                     import csv
-                    writer = csv.DictWriter(f, fieldnames=["filename", "total_pages", "text_pages", "image_only"])
+                    writer = csv.DictWriter(f, fieldnames=list(COLUMNS) + ["ratio", "error"])
                     writer.writeheader()
                     writer.writerows(self.results)
                 else:
@@ -104,5 +191,6 @@ if __name__ == "__main__":
     app = PDFAnalyzerApp(root)
     root.mainloop()
 # This script provides a GUI for analyzing PDF files in a selected directory.
-# It allows users to filter results, save them in JSON or CSV format, and run the analysis in a separate thread.
-# The GUI is built using Tkinter, and the analysis is performed using a separate script.
\ No newline at end of file
+# Scans run analyze_pdf_folder.analyze_folder in a background thread (PDFs are analyzed in a process pool);
+# results stream back through a queue that the Tk loop polls with root.after, so the table fills progressively.
+# Scans can be cancelled, and results can be filtered and saved in JSON or CSV format.
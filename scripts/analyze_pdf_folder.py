@@ -8,71 +8,351 @@
 # - Estimates % of pages with extractable text
 # - Flags scanned/image-based or empty PDFs
 # Useful for pre-checking OCR needs or ingest quality
+#
+# --fast samples N pages per PDF and checks fonts + text operators in
+# the page content stream instead of extracting text. PDFs are analyzed
+# across a process pool and results are cached by file hash in
+# full/.precheck_cache/, so unchanged PDFs are never reopened.
+#
+# --index classifies every page (text / image-only / empty) with the same
+# cheap check and writes full/pdf_page_index.json for smart_ingest.py.
+#
+# analyze_folder() is the API used by pdf_gui.py: it streams per-file
+# results onto a queue as workers finish and honours a cancel event.
 # ----------------------------------------
 
-import fitz  # PyMuPDF
 import os
+import re
 import sys
+import json
+import argparse
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # Import logging setup from config.py
 from config import setup_logging
 
-# Call the setup function to configure logging
-setup_logging()
-
-# Now you can use logging throughout the script
+# Logging is configured in main(), so importing this module has no side effects
 import logging
 
 # Load ingestion folder from config
 sys.path.append(str(Path(__file__).resolve().parents[1]))
-from config import INGESTION_SOURCE
+from config import settings, PRECHECK_CACHE_DIR, PRECHECK_SAMPLE_PAGES, PDF_PAGE_INDEX
+from ingest_manifest import file_sha256
+from page_index import PAGE_TEXT, PAGE_IMAGE, PAGE_EMPTY, index_key, page_index_entry, write_page_index
+
+# Bump when result fields, page classification or cache keys change so old entries are ignored
+PRECHECK_CACHE_VERSION = 2
+
+# "BT" (begin text object) as a standalone content-stream operator
+_TEXT_OBJECT = re.compile(rb"(?:^|[\s\]>)])BT(?:\s|$)")
+
+# ----------------------------------------
+# Evenly spread page indices: first, last and n-2 in between (n <= 0: all)
+# ----------------------------------------
+def sample_page_indices(total: int, n: int) -> list:
+    if n <= 0 or n >= total:
+        return list(range(total))
+    if n == 1:
+        return [0]
+    return sorted({round(i * (total - 1) / (n - 1)) for i in range(n)})
+
+# ----------------------------------------
+# Cheap text check: fonts in the page resources and a text object in
+# its content stream. Text drawn only inside form XObjects has no BT in
+# the page stream, so pages with fonts but no BT fall back to extraction.
+# ----------------------------------------
+def page_has_text_fast(page) -> bool:
+    if not page.get_fonts():
+        return False
+    if page.get_contents():
+        if _TEXT_OBJECT.search(page.read_contents()):
+            return True
+    return bool(page.get_text().strip())
+
+# Page state for the extractability index: text, image-only or empty
+def classify_page(page) -> str:
+    if page_has_text_fast(page):
+        return PAGE_TEXT
+    return PAGE_IMAGE if page.get_images() else PAGE_EMPTY
 
 # ----------------------------------------
 # Analyze a single PDF for extractability
+# sample_pages > 0: fast sampled check; text_pages is then an estimate
+# index: classify every page with the fast check (adds page_states)
 # ----------------------------------------
-def analyze_pdf(path: Path) -> dict:
+def analyze_pdf(path: Path, sample_pages: int = 0, index: bool = False) -> dict:
     # analyzes the PDF
+    import fitz  # PyMuPDF; imported here so cached scans and the GUI start without it
     try:
-        doc = fitz.open(path)
-        total_pages = len(doc)
-        extractable_pages = sum(1 for page in doc if page.get_text().strip())
-        return {
+        states = None
+        with fitz.open(path) as doc:
+            total_pages = len(doc)
+            if index:
+                states = "".join(classify_page(page) for page in doc)
+                indices = range(total_pages)
+                extractable_pages = states.count(PAGE_TEXT)
+            elif sample_pages > 0:
+                indices = sample_page_indices(total_pages, sample_pages)
+                hits = sum(1 for i in indices if page_has_text_fast(doc[i]))
+                extractable_pages = round(total_pages * hits / max(1, len(indices)))
+            else:
+                indices = range(total_pages)
+                extractable_pages = sum(1 for page in doc if page.get_text().strip())
+        result = {
             "filename": path.name,
             "pages": total_pages,
+            "sampled": len(indices),
             "text_pages": extractable_pages,
             "ratio": round(100 * extractable_pages / max(1, total_pages), 1)
         }
+        if states is not None:
+            result["image_pages"] = states.count(PAGE_IMAGE)
+            result["page_states"] = states
+        return result
     except Exception as e:
         logging.error(f"Error analyzing PDF: {path.name}, Error: {str(e)}")  # Log the error
         return {
             "filename": path.name,
             "pages": 0,
+            "sampled": 0,
             "text_pages": 0,
             "ratio": 0.0,
             "error": str(e)
         }
 
+# Hashes that already have a cached result for the current mode (set per worker)
+_cached_hashes = frozenset()
+
+def _init_worker(cached_hashes: frozenset):
+    global _cached_hashes
+    _cached_hashes = cached_hashes
+
+# ----------------------------------------
+# Worker entry: (path, sample_pages, index, hash_file) → (sha256, result)
+# The file is hashed in the worker; a hash with a cached result (renamed
+# or touched file) returns result None instead of reopening the PDF
+# ----------------------------------------
+def _analyze_task(task: tuple) -> tuple:
+    path, sample_pages, index, hash_file = task
+    sha256 = None
+    if hash_file:
+        try:
+            sha256 = file_sha256(path)
+        except OSError:
+            pass
+        if sha256 in _cached_hashes:
+            return sha256, None
+    return sha256, analyze_pdf(path, sample_pages, index)
+
+# ----------------------------------------
+# Results cache keyed by file content hash
+# files:   absolute path → size, mtime, sha256 (cheap unchanged check)
+# results: "<sha256>:<mode>" → analysis result
+# One cache serves every scanned folder (CLI and GUI)
+# ----------------------------------------
+class PrecheckCache:
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.path = self.cache_dir / "precheck.json"
+        self.files = {}
+        self.results = {}
+        self.load()
+
+    def load(self):
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return
+        if data.get("version") != PRECHECK_CACHE_VERSION:
+            return
+        self.files = data.get("files", {})
+        self.results = data.get("results", {})
+
+    # Write to a temp file first so an interrupted save never corrupts the cache
+    def save(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".json.tmp")
+        data = {"version": PRECHECK_CACHE_VERSION, "files": self.files, "results": self.results}
+        tmp.write_text(json.dumps(data), encoding="utf-8")
+        tmp.replace(self.path)
+
+    def key(self, path: Path) -> str:
+        return str(Path(path).resolve())
+
+    # Known hash if size + mtime are unchanged, else None
+    def known_hash(self, path: Path) -> str | None:
+        entry = self.files.get(self.key(path))
+        stat = path.stat()
+        if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            return entry["sha256"]
+        return None
+
+    def remember_hash(self, path: Path, sha256: str):
+        stat = path.stat()
+        self.files[self.key(path)] = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": sha256}
+
+    def get(self, sha256: str, mode: str) -> dict | None:
+        return self.results.get(f"{sha256}:{mode}")
+
+    def put(self, sha256: str, mode: str, result: dict):
+        self.results[f"{sha256}:{mode}"] = result
+
+    def hashes(self, mode: str) -> frozenset:
+        suffix = f":{mode}"
+        return frozenset(key[:-len(suffix)] for key in self.results if key.endswith(suffix))
+
+    # Drop entries for files that no longer exist and results nothing points to
+    def prune(self):
+        self.files = {k: v for k, v in self.files.items() if os.path.exists(k)}
+        hashes = {v["sha256"] for v in self.files.values()}
+        self.results = {k: v for k, v in self.results.items() if k.split(":", 1)[0] in hashes}
+
+# ----------------------------------------
+# Yield (pdf, result) as results become available
+# Cached results come first; the rest are analyzed across a process pool
+# and yielded in completion order. Setting `cancel` (threading.Event)
+# stops the scan and drops queued work.
+# ----------------------------------------
+def iter_analyze_pdfs(pdfs: list, sample_pages: int = 0, workers: int = 0, cache: PrecheckCache | None = None,
+                      index: bool = False, cancel=None):
+    workers = workers or os.cpu_count() or 1
+    mode = "index" if index else f"sample{sample_pages}" if sample_pages > 0 else "full"
+
+    todo = []
+    for pdf in pdfs:
+        sha256 = cache.known_hash(pdf) if cache else None
+        cached = cache.get(sha256, mode) if sha256 else None
+        if cached:
+            yield pdf, {**cached, "filename": pdf.name}
+        else:
+            todo.append(pdf)
+
+    logging.info(f"PDF pre-check: {len(pdfs) - len(todo)} cached, {len(todo)} to analyze ({mode}, {workers} worker(s))")
+    if not todo:
+        return
+
+    def finish(pdf, sha256, result):
+        if sha256:
+            cache.remember_hash(pdf, sha256)
+        if result is None:
+            return {**cache.get(sha256, mode), "filename": pdf.name}
+        if sha256 and "error" not in result:
+            cache.put(sha256, mode, result)
+        return result
+
+    cached_hashes = cache.hashes(mode) if cache else frozenset()
+    tasks = [(pdf, sample_pages, index, cache is not None) for pdf in todo]
+
+    if workers <= 1 or len(tasks) == 1:
+        _init_worker(cached_hashes)
+        for task in tasks:
+            if cancel and cancel.is_set():
+                return
+            yield task[0], finish(task[0], *_analyze_task(task))
+        return
+
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker, initargs=(cached_hashes,))
+    cancelled = False
+    try:
+        futures = {pool.submit(_analyze_task, task): task[0] for task in tasks}
+        for future in as_completed(futures):
+            pdf = futures[future]
+            yield pdf, finish(pdf, *future.result())
+            if cancel and cancel.is_set():
+                cancelled = True
+                break
+    finally:
+        # On cancel, drop queued files and do not wait for PDFs still in progress
+        pool.shutdown(wait=not cancelled, cancel_futures=True)
+
+# Analyze many PDFs; returns results in the order of `pdfs`
+def analyze_pdfs(pdfs: list, sample_pages: int = 0, workers: int = 0, cache: PrecheckCache | None = None,
+                 index: bool = False) -> list:
+    results = dict(iter_analyze_pdfs(pdfs, sample_pages, workers, cache, index))
+    return [results[pdf] for pdf in pdfs]
+
+# ----------------------------------------
+# Folder-analysis API (used by pdf_gui.py)
+# Scans `folder` for PDFs and returns their results in completion order.
+# With result_queue, progress is also posted as it happens:
+#   ("start", total) → ("result", dict) per file → ("error", message)? → ("done", count)
+# Safe to run in a background thread; `cancel` stops it early.
+# ----------------------------------------
+def analyze_folder(folder, result_queue=None, cancel=None, sample_pages: int = PRECHECK_SAMPLE_PAGES,
+                   workers: int = 0, use_cache: bool = True) -> list:
+    folder = Path(folder)
+    pdfs = sorted(folder.rglob("*.pdf"))
+    cache = PrecheckCache(PRECHECK_CACHE_DIR) if use_cache else None
+    results = []
+    if result_queue is not None:
+        result_queue.put(("start", len(pdfs)))
+
+    try:
+        for _, result in iter_analyze_pdfs(pdfs, sample_pages, workers, cache, cancel=cancel):
+            results.append(result)
+            if result_queue is not None:
+                result_queue.put(("result", result))
+    except Exception as e:
+        logging.error(f"Folder analysis failed: {folder}, Error: {str(e)}")
+        if result_queue is None:
+            raise
+        result_queue.put(("error", str(e)))
+    finally:
+        if cache:
+            cache.save()
+        if result_queue is not None:
+            result_queue.put(("done", len(results)))
+    return results
+
 # ----------------------------------------
 # Walk the ingestion folder and analyze all PDFs
 # ----------------------------------------
 def main():
+    parser = argparse.ArgumentParser(description="Audit PDFs for extractable text.")
+    parser.add_argument("--input", type=str, default=None, help="Folder to scan for PDFs (default: REPO_ROOT/ingestion_source)")
+    parser.add_argument("--fast", action="store_true", help="Sample pages and check fonts/text objects instead of extracting text")
+    parser.add_argument("--sample-pages", type=int, default=PRECHECK_SAMPLE_PAGES, help="Pages sampled per PDF with --fast")
+    parser.add_argument("--workers", type=int, default=0, help="Parallel PDF analysis (default: 0 = all CPU cores)")
+    parser.add_argument("--index", action="store_true",
+                        help="Classify every page and write the page index used by smart_ingest.py")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and do not update the precheck cache")
+    args = parser.parse_args()
+
+    setup_logging()
     logging.info("Script started: analyze_pdf_folder.py")  # Log when the script starts
+    settings.require("precheck")
 
-    pdfs = list(INGESTION_SOURCE.rglob("*.pdf"))
+    source = Path(args.input) if args.input else settings.INGESTION_SOURCE
+    pdfs = sorted(source.rglob("*.pdf"))
     if not pdfs:
-        logging.info(f"No PDFs found in {INGESTION_SOURCE}")  # Log if no PDFs are found
+        logging.info(f"No PDFs found in {source}")  # Log if no PDFs are found
         return
 
-    logging.info(f"\n[📄] PDF Pre-Check: {len(pdfs)} file(s) found in {INGESTION_SOURCE}\n")
-    header = f"{'File':40} | Pages | Text Pages | % Text"
+    cache = None if args.no_cache else PrecheckCache(PRECHECK_CACHE_DIR)
+    results = analyze_pdfs(pdfs, args.sample_pages if args.fast else 0, args.workers, cache, index=args.index)
+    if cache:
+        cache.prune()
+        cache.save()
+
+    if args.index:
+        entries = {
+            index_key(pdf): page_index_entry(pdf, result["page_states"])
+            for pdf, result in zip(pdfs, results) if "page_states" in result
+        }
+        write_page_index(PDF_PAGE_INDEX, entries)
+        image_pages = sum(result.get("image_pages", 0) for result in results)
+        logging.info(f"Page index for {len(entries)} PDF(s) → {PDF_PAGE_INDEX} ({image_pages} image-only page(s))")
+
+    logging.info(f"\n[📄] PDF Pre-Check: {len(pdfs)} file(s) found in {source}\n")
+    header = f"{'File':40} | Pages | Sampled | Text Pages | % Text"
     logging.info(header)
     logging.info("-" * len(header))
 
-    for pdf in pdfs:
-        result = analyze_pdf(pdf)
+    for result in results:
         logging.info(f"{result['filename'][:40]:40} | "
                      f"{result['pages']:>5}  | "
+                     f"{result['sampled']:>7} | "
                      f"{result['text_pages']:>10}  | "
                      f"{result['ratio']:>6}%")
 
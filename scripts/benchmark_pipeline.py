@@ -0,0 +1,628 @@
+# scripts/benchmark_pipeline.py
+
+# ----------------------------------------
+# Pipeline Benchmarks
+# ----------------------------------------
+# Measures throughput of the pipeline on deterministic synthetic input
+# (or real files) so regressions show up before a production run slows
+# down.
+#
+# Synthetic corpus: PDF, Markdown, HTML, EPUB and Apify crawl (JSONL)
+# files generated from a seed at a configurable --scale, with boilerplate
+# and repeated passages so the filter and dedup stages have work to do.
+#
+# Stages:
+# - ingest:     smart_ingest.process_file over the corpus (per file type)
+# - chunk:      sentence windowing + chunk_sentences on long pages
+# - clean_text: ingest + clean-stage text normalization
+# - clean:      clean_chunk over the ingested chunks
+# - is_junk:    boilerplate matching
+# - dedup:      exact + near-duplicate detection
+# - split:      write_chunk_stream (encode, pack, write, manifest)
+# - e2e:        ingest → clean → filter → title → split, end to end
+#
+# Each stage runs in a fresh process (unless --in-process) so its peak
+# RSS is its own. Results (chunks/sec, MB/s, peak RSS) are printed as
+# JSON and can be saved as a baseline and compared against later.
+# ----------------------------------------
+
+import io
+import os
+import re
+import sys
+import json
+import html
+import time
+import random
+import shutil
+import zipfile
+import argparse
+import platform
+import tempfile
+import textwrap
+import contextlib
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+WORDS = (
+    "the pipeline chunk token overlap window sentence page document crawl "
+    "vector embedding retrieval model index schema domain metadata source "
+    "content parser markdown heading paragraph install configure deploy "
+    "cluster node query latency throughput memory storage network request"
+).split()
+
+# Boilerplate lines (match junk_patterns.txt) sprinkled into the corpus
+BOILERPLATE = [
+    "Copyright 2024 Example Corp. All rights reserved.",
+    "Subscribe to our newsletter for product updates.",
+    "Please enable JavaScript to view this page.",
+    "Read our privacy policy and terms of service.",
+]
+
+# Files per unit of --scale, and the size of each
+CORPUS_FILES = {"pdf": 2, "md": 4, "html": 4, "epub": 1, "crawl": 1}
+PDF_PAGES = 10
+DOC_SECTIONS = 8
+CRAWL_ENTRIES = 250
+
+STAGES = ["ingest", "chunk", "clean_text", "clean", "is_junk", "dedup", "split", "e2e"]
+
+# Stages that read the ingested corpus (work_dir/unified.ndjson)
+NEEDS_INGEST = {"clean", "is_junk", "dedup", "split"}
+
+# ----------------------------------------
+# Deterministic synthetic prose: n sentences of 5-40 words
+# ----------------------------------------
+def synthetic_sentences(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))).capitalize() + "."
+        for _ in range(n)
+    ]
+
+# Run fn() `repeat` times and return the best wall-clock seconds
+def best_of(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+# Common result shape: chunks/sec and MB/s where they apply
+def throughput(stage: str, seconds: float, chunks: int | None = None, mb: float | None = None, **extra) -> dict:
+    seconds = max(seconds, 1e-9)
+    result = {"stage": stage, "seconds": round(seconds, 4)}
+    if chunks is not None:
+        result["chunks"] = chunks
+        result["chunks_per_sec"] = round(chunks / seconds, 1)
+    if mb is not None:
+        result["mb"] = round(mb, 3)
+        result["mb_per_sec"] = round(mb / seconds, 2)
+    result.update(extra)
+    return result
+
+def text_mb(texts) -> float:
+    return sum(len(t.encode("utf-8")) for t in texts) / 1e6
+
+# Peak resident set size of this process in MB (None where unsupported)
+def peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+# ----------------------------------------
+# Synthetic corpus generator
+# Same --scale and --seed → byte-identical files
+# ----------------------------------------
+def _paragraphs(rng: random.Random, n: int, seed: int) -> list:
+    sentences = synthetic_sentences(n * 6, seed=seed)
+    paras = [" ".join(sentences[i:i + rng.randint(3, 6)]) for i in range(0, len(sentences), 6)]
+    # Roughly one paragraph in ten is boilerplate
+    return [rng.choice(BOILERPLATE) if rng.random() < 0.1 else p for p in paras]
+
+def _write_pdf(path: Path, rng: random.Random, seed: int):
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    for page_no in range(PDF_PAGES):
+        page = doc.new_page()
+        lines = []
+        for para in _paragraphs(rng, 6, seed * 1000 + page_no):
+            lines.extend(textwrap.wrap(para, 95) + [""])
+        page.insert_text((50, 60), "\n".join(lines[:64]), fontsize=9)
+    doc.set_metadata({})
+    doc.save(str(path), garbage=3, deflate=True, no_new_id=True)
+    doc.close()
+
+def _markdown(rng: random.Random, seed: int) -> str:
+    out = [f"# Guide {seed}", ""]
+    for s in range(DOC_SECTIONS):
+        out += [f"## {' '.join(rng.sample(WORDS, 3)).title()}", ""]
+        for para in _paragraphs(rng, 3, seed * 100 + s):
+            out += [para, ""]
+        if s % 3 == 0:
+            out += ["```bash", f"make run WORKERS={s}", "```", ""]
+        if s % 2 == 1:
+            out += [f"- {w}" for w in rng.sample(WORDS, 4)] + [""]
+    return "\n".join(out)
+
+def _html(rng: random.Random, seed: int) -> str:
+    body = []
+    for s in range(DOC_SECTIONS):
+        body.append(f"<h2>{html.escape(' '.join(rng.sample(WORDS, 3)).title())}</h2>")
+        body += [f"<p>{html.escape(p)} &amp; <b>more</b>&nbsp;</p>" for p in _paragraphs(rng, 3, seed * 100 + s)]
+    return (
+        f"<!DOCTYPE html>\n<html><head><title>Page {seed}</title></head><body>\n"
+        "<nav>Home | Docs | Blog</nav>\n" + "\n".join(body) +
+        f"\n<footer>{BOILERPLATE[0]}</footer>\n</body></html>\n"
+    )
+
+def _write_epub(path: Path, rng: random.Random, seed: int):
+    chapters = []
+    for c in range(DOC_SECTIONS // 2):
+        paras = "".join(f"<p>{html.escape(p)}</p>" for p in _paragraphs(rng, 4, seed * 100 + c))
+        chapters.append(
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<html xmlns="http://www.w3.org/1999/xhtml"><head><title>Chapter</title></head>'
+            f"<body><h1>Chapter {c + 1}</h1>{paras}</body></html>"
+        )
+    manifest = "".join(f'<item id="c{i}" href="c{i}.xhtml" media-type="application/xhtml+xml"/>' for i in range(len(chapters)))
+    spine = "".join(f'<itemref idref="c{i}"/>' for i in range(len(chapters)))
+    files = {
+        "META-INF/container.xml": (
+            '<?xml version="1.0"?><container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+            '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+            "</rootfiles></container>"
+        ),
+        "OEBPS/content.opf": (
+            '<?xml version="1.0" encoding="utf-8"?>'
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="id">'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f'<dc:identifier id="id">bench-{seed}</dc:identifier><dc:title>Book {seed}</dc:title>'
+            "<dc:language>en</dc:language></metadata>"
+            f"<manifest>{manifest}</manifest><spine>{spine}</spine></package>"
+        ),
+        **{f"OEBPS/c{i}.xhtml": chapter for i, chapter in enumerate(chapters)},
+    }
+    # Fixed timestamps keep the archive byte-identical; mimetype goes first, uncompressed
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr(zipfile.ZipInfo("mimetype", (1980, 1, 1, 0, 0, 0)), "application/epub+zip")
+        for name, data in files.items():
+            zf.writestr(zipfile.ZipInfo(name, (1980, 1, 1, 0, 0, 0)), data, zipfile.ZIP_DEFLATED)
+
+# Apify crawl dump: pages with url/text/markdown/metadata, ~10% exact and
+# ~5% near-duplicate entries, some without titles
+def _crawl_lines(rng: random.Random, seed: int) -> str:
+    entries = []
+    for i in range(CRAWL_ENTRIES):
+        if entries and rng.random() < 0.1:
+            text = rng.choice(entries)["text"]
+        elif entries and rng.random() < 0.05:
+            words = rng.choice(entries)["text"].split()
+            words[rng.randrange(len(words))] = rng.choice(WORDS)
+            text = " ".join(words)
+        else:
+            text = "\n\n".join(_paragraphs(rng, rng.randint(2, 6), seed * 10_000 + i))
+        path = "/".join(rng.sample(WORDS, 2))
+        entries.append({
+            "url": f"https://docs.site{seed}.example/{path}/{i}",
+            "text": text,
+            "markdown": f"# {path}\n\n{text}",
+            "metadata": {"title": path.replace("/", " ").title() if rng.random() < 0.7 else None}
+        })
+    return "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+
+def generate_corpus(out_dir: Path, scale: float = 1.0, seed: int = 0) -> dict:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for kind, per_unit in CORPUS_FILES.items():
+        for i in range(max(1, round(per_unit * scale))):
+            file_seed = seed * 1_000_003 + i
+            rng = random.Random(f"{kind}:{file_seed}")
+            if kind == "pdf":
+                _write_pdf(out_dir / f"bench_pdf_{i:03d}.pdf", rng, file_seed)
+            elif kind == "md":
+                (out_dir / f"bench_md_{i:03d}.md").write_text(_markdown(rng, file_seed), encoding="utf-8")
+            elif kind == "html":
+                (out_dir / f"bench_html_{i:03d}.html").write_text(_html(rng, file_seed), encoding="utf-8")
+            elif kind == "epub":
+                _write_epub(out_dir / f"bench_epub_{i:03d}.epub", rng, file_seed)
+            else:
+                (out_dir / f"site{i}_crawl.jsonl").write_text(_crawl_lines(rng, file_seed), encoding="utf-8")
+    return describe_corpus(out_dir)
+
+# File count and MB per extension
+def describe_corpus(corpus_dir: Path) -> dict:
+    from smart_ingest import collect_source_files
+
+    by_type = {}
+    for path in collect_source_files(corpus_dir):
+        entry = by_type.setdefault(path.suffix.lower(), {"files": 0, "mb": 0.0})
+        entry["files"] += 1
+        entry["mb"] += path.stat().st_size / 1e6
+    for entry in by_type.values():
+        entry["mb"] = round(entry["mb"], 3)
+    return {
+        "files": sum(e["files"] for e in by_type.values()),
+        "mb": round(sum(e["mb"] for e in by_type.values()), 3),
+        "by_type": by_type
+    }
+
+def load_chunks(path) -> list:
+    from chunk_stream import iter_chunks
+    return list(iter_chunks(Path(path)))
+
+# ----------------------------------------
+# Benchmark: ingest every corpus file (no ingest cache) → NDJSON
+# Keeps the fastest run; MB/s is over input file bytes
+# ----------------------------------------
+def ingest_corpus(corpus_dir: Path, output: Path) -> dict:
+    from smart_ingest import collect_source_files, process_file
+    from chunk_stream import NdjsonWriter
+
+    by_type = {}
+    with NdjsonWriter(output) as writer:
+        for path in collect_source_files(corpus_dir):
+            t0 = time.perf_counter()
+            chunks = process_file(path)
+            entry = by_type.setdefault(path.suffix.lower(), {"files": 0, "chunks": 0, "bytes": 0, "seconds": 0.0})
+            entry["seconds"] += time.perf_counter() - t0
+            entry["files"] += 1
+            entry["chunks"] += len(chunks)
+            entry["bytes"] += path.stat().st_size
+            writer.write_many(chunks)
+    return by_type
+
+def bench_ingest(corpus_dir: str, output: str, repeat: int) -> dict:
+    from smart_ingest import ensure_punkt
+    ensure_punkt()
+
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        by_type = ingest_corpus(Path(corpus_dir), Path(output))
+        seconds = time.perf_counter() - t0
+        if best is None or seconds < best[0]:
+            best = (seconds, by_type)
+
+    seconds, by_type = best
+    return throughput(
+        "ingest", seconds,
+        chunks=sum(e["chunks"] for e in by_type.values()),
+        mb=sum(e["bytes"] for e in by_type.values()) / 1e6,
+        files=sum(e["files"] for e in by_type.values()),
+        by_type={ext: {k: v for k, v in throughput(ext, e["seconds"], e["chunks"], e["bytes"] / 1e6,
+                                                  files=e["files"]).items() if k != "stage"}
+                 for ext, e in sorted(by_type.items())}
+    )
+
+# ----------------------------------------
+# Benchmark: sentence chunking on long "pages"
+# ----------------------------------------
+def bench_chunk(pages: list, target_tokens: int, overlap_tokens: int, repeat: int) -> dict:
+    from smart_ingest import chunk_sentences, sentence_windows, sent_tokenize
+    from token_counter import WhitespaceCounter
+
+    counter = WhitespaceCounter()
+    meta = {"source_path": "bench/doc"}
+    tokenized = [sent_tokenize(text) for text in pages]
+    n_sentences = sum(len(s) for s in tokenized)
+
+    # Windowing alone (counts precomputed): isolates the overlap algorithm
+    counts = [counter.count_many(s) for s in tokenized]
+    windows_s = best_of(lambda: [list(sentence_windows(c, target_tokens, overlap_tokens)) for c in counts], repeat)
+
+    # Full chunker: sentence split + counting + windowing + join
+    full_s = best_of(lambda: [chunk_sentences(t, target_tokens, overlap_tokens, meta, counter) for t in pages], repeat)
+    n_chunks = sum(len(chunk_sentences(t, target_tokens, overlap_tokens, meta, counter)) for t in pages)
+
+    return throughput(
+        "chunk", full_s, chunks=n_chunks, mb=text_mb(pages),
+        pages=len(pages),
+        sentences=n_sentences,
+        windows_sentences_per_sec=round(n_sentences / windows_s),
+        chunk_sentences_per_sec=round(n_sentences / full_s)
+    )
+
+# ----------------------------------------
+# Benchmark: text normalization on crawl-like entries
+# ----------------------------------------
+def _legacy_clean(text: str) -> str:
+    # Pre-text_normalize implementation (7 passes), kept for comparison
+    text = html.unescape(text)
+    text = text.replace("\u00ad", "").replace("\xa0", " ").replace("\n", " ")
+    text = re.sub(r"\s+", " ", text).strip()
+    text = re.sub(r"!\[[^\]]*\]\([^)]+\)", "", text)
+    text = re.sub(r"<[^>]+>", "", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+def bench_clean_text(texts: list, repeat: int) -> dict:
+    from text_normalize import clean_raw_text, clean_chunk_text
+
+    mb = text_mb(texts)
+    raw_s = best_of(lambda: [clean_raw_text(t) for t in texts], repeat)
+    both_s = best_of(lambda: [clean_chunk_text(clean_raw_text(t)) for t in texts], repeat)
+    legacy_s = best_of(lambda: [_legacy_clean(t) for t in texts], repeat)
+
+    return throughput(
+        "clean_text", both_s, mb=mb,
+        entries=len(texts),
+        clean_raw_text_mb_per_sec=round(mb / raw_s, 1),
+        ingest_plus_clean_mb_per_sec=round(mb / both_s, 1),
+        legacy_mb_per_sec=round(mb / legacy_s, 1)
+    )
+
+# Crawl-like entry texts: entities, nbsp, soft hyphens, images and tags
+def synthetic_crawl_texts(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    extras = ["&amp;", "&lt;code&gt;", "\xa0", "\u00ad", "![diagram](/img/a.png)", "<br/>", "<span>", "\n\n"]
+    texts = []
+    for i in range(n):
+        parts = synthetic_sentences(rng.randint(5, 40), seed=seed * 100_003 + i)
+        texts.append(" ".join(p + (rng.choice(extras) if rng.random() < 0.3 else "") for p in parts))
+    return texts
+
+# Entry texts from an Apify crawl dump (JSON array or NDJSON)
+def load_crawl_texts(path: str) -> list:
+    from chunk_stream import iter_chunks
+    return [e.get("text") or e.get("content") or "" for e in iter_chunks(Path(path))]
+
+# Page texts from a real PDF, or synthetic long pages
+def load_pages(pdf: str | None, pages: int, sentences_per_page: int) -> list:
+    if pdf:
+        import fitz
+        with fitz.open(pdf) as doc:
+            return [page.get_text() for page in doc]
+    return [" ".join(synthetic_sentences(sentences_per_page, seed=i)) for i in range(pages)]
+
+# ----------------------------------------
+# Benchmarks over the ingested corpus chunks
+# ----------------------------------------
+def bench_clean(chunks_path: str, repeat: int) -> dict:
+    from clean_json_chunks import clean_chunk
+
+    chunks = load_chunks(chunks_path)
+    seconds = best_of(lambda: [clean_chunk(c) for c in chunks], repeat)
+    kept = sum(1 for c in chunks if clean_chunk(c))
+    return throughput("clean", seconds, len(chunks), text_mb(c.get("content", "") for c in chunks), kept=kept)
+
+def _cleaned_contents(chunks_path: str) -> list:
+    from clean_json_chunks import clean_chunk
+    return [c for c in map(clean_chunk, load_chunks(chunks_path)) if c]
+
+def bench_is_junk(chunks_path: str, repeat: int) -> dict:
+    from filter_chunks import is_junk
+
+    texts = [c["content"] for c in _cleaned_contents(chunks_path)]
+    seconds = best_of(lambda: [is_junk(t) for t in texts], repeat)
+    return throughput("is_junk", seconds, len(texts), text_mb(texts), junk=sum(map(is_junk, texts)))
+
+def bench_dedup(chunks_path: str, repeat: int) -> dict:
+    from dedup import Deduplicator
+
+    texts = [c["content"] for c in _cleaned_contents(chunks_path)]
+    stats = {}
+
+    def run():
+        dedup = Deduplicator()
+        for text in texts:
+            dedup.check(text)
+        stats.update(dedup.stats)
+
+    seconds = best_of(run, repeat)
+    return throughput("dedup", seconds, len(texts), text_mb(texts),
+                      exact_duplicates=stats["exact"], near_duplicates=stats["near"])
+
+def bench_split(chunks_path: str, work_dir: str, repeat: int) -> dict:
+    from split_large_json_files import write_chunk_stream
+
+    chunks = _cleaned_contents(chunks_path)
+    out = Path(work_dir) / "split"
+
+    def run():
+        shutil.rmtree(out, ignore_errors=True)
+        write_chunk_stream(iter(chunks), out)
+
+    seconds = best_of(run, repeat)
+    written = sum(p.stat().st_size for p in out.glob("*.json")) / 1e6
+    return throughput("split", seconds, len(chunks), written, files=len(list(out.glob("*.json"))))
+
+# ----------------------------------------
+# Benchmark: ingest → process (clean/filter/dedup/title/split) end to end
+# MB/s is over input file bytes
+# ----------------------------------------
+def bench_e2e(corpus_dir: str, work_dir: str, repeat: int) -> dict:
+    from smart_ingest import ensure_punkt
+    from run_pipeline import run_pipeline
+    from dedup import Deduplicator
+
+    ensure_punkt()
+    work = Path(work_dir) / "e2e"
+    stats = {}
+
+    def run():
+        shutil.rmtree(work, ignore_errors=True)
+        by_type = ingest_corpus(Path(corpus_dir), work / "unified.ndjson")
+        stats["ingested"] = sum(e["chunks"] for e in by_type.values())
+        stats["bytes"] = sum(e["bytes"] for e in by_type.values())
+        stats.update(run_pipeline(work / "unified.ndjson", work / "split", dedup=Deduplicator()))
+
+    seconds = best_of(run, repeat)
+    return throughput("e2e", seconds, stats["ingested"], stats["bytes"] / 1e6,
+                      kept=stats["kept"], domains=stats["domains"])
+
+# ----------------------------------------
+# Stage runner: one stage per call, optionally in a fresh process
+# Stage output (ingest's debug prints included) goes to stderr so stdout
+# stays pure JSON
+# ----------------------------------------
+def run_stage(stage: str, params: dict) -> dict:
+    with contextlib.redirect_stdout(sys.stderr):
+        if stage == "ingest":
+            result = bench_ingest(params["corpus"], params["chunks"], params["repeat"])
+        elif stage == "chunk":
+            pages = load_pages(params["pdf"], params["pages"], params["sentences_per_page"])
+            result = bench_chunk(pages, params["target_tokens"], params["overlap_tokens"], params["repeat"])
+        elif stage == "clean_text":
+            texts = load_crawl_texts(params["crawl"]) if params["crawl"] else synthetic_crawl_texts(params["entries"])
+            result = bench_clean_text(texts, params["repeat"])
+        elif stage == "clean":
+            result = bench_clean(params["chunks"], params["repeat"])
+        elif stage == "is_junk":
+            result = bench_is_junk(params["chunks"], params["repeat"])
+        elif stage == "dedup":
+            result = bench_dedup(params["chunks"], params["repeat"])
+        elif stage == "split":
+            result = bench_split(params["chunks"], params["work_dir"], params["repeat"])
+        else:
+            result = bench_e2e(params["corpus"], params["work_dir"], params["repeat"])
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+def run_isolated(stage: str, params: dict) -> dict:
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # spawn (not fork): the child starts from a bare interpreter, so its
+    # peak RSS reflects only this stage
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_stage, stage, params).result()
+
+# ----------------------------------------
+# Baseline comparison
+# *_per_sec: regression if it drops by more than `tolerance`
+# peak_rss_mb: regression if it grows by more than `tolerance`
+# ----------------------------------------
+def compare_to_baseline(report: dict, baseline: dict, tolerance: float) -> list:
+    base = {r["stage"]: r for r in baseline.get("results", [])}
+    rows = []
+    for result in report["results"]:
+        before = base.get(result["stage"])
+        if not before:
+            continue
+        for key, value in result.items():
+            old = before.get(key)
+            if not (key.endswith("_per_sec") or key == "peak_rss_mb") or not old or value is None:
+                continue
+            change = value / old - 1
+            regression = change > tolerance if key == "peak_rss_mb" else change < -tolerance
+            rows.append({
+                "stage": result["stage"],
+                "metric": key,
+                "baseline": old,
+                "current": value,
+                "change": round(change, 3),
+                "regression": regression
+            })
+    return rows
+
+# ----------------------------------------
+# CLI entrypoint
+# ----------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage and end-to-end pipeline benchmarks.")
+    parser.add_argument("--stage", nargs="+", choices=STAGES + ["all"], default=["all"], help="Which benchmarks to run")
+    parser.add_argument("--scale", type=float, default=1.0, help="Synthetic corpus size multiplier")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic corpus seed")
+    parser.add_argument("--corpus", type=str, default=None, help="Benchmark this folder of documents instead of a synthetic corpus")
+    parser.add_argument("--write-corpus", type=str, default=None, help="Only generate the synthetic corpus into this folder")
+    parser.add_argument("--in-process", action="store_true", help="Run all stages in this process (peak RSS is then cumulative)")
+    parser.add_argument("--output", type=str, default=None, help="Also write the JSON report to this file")
+    parser.add_argument("--baseline", type=str, default=None, help="Compare against this report (default: BENCH_BASELINE_FILE if present)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown / RSS growth before a regression is flagged")
+    parser.add_argument("--pdf", type=str, default=None, help="Benchmark chunking on a real PDF instead of synthetic text")
+    parser.add_argument("--crawl", type=str, default=None, help="Benchmark clean_text on a real Apify crawl dump")
+    parser.add_argument("--entries", type=int, default=20000, help="Synthetic crawl entries for clean_text")
+    parser.add_argument("--pages", type=int, default=20, help="Synthetic page count")
+    parser.add_argument("--sentences-per-page", type=int, default=5000, help="Synthetic sentences per page (long pages stress overlap)")
+    parser.add_argument("--target-tokens", type=int, default=1000)
+    parser.add_argument("--overlap-tokens", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3, help="Best-of-N timing repeats")
+    args = parser.parse_args()
+
+    if args.write_corpus:
+        print(json.dumps(generate_corpus(Path(args.write_corpus), args.scale, args.seed), indent=2))
+        return
+
+    from config import BENCH_BASELINE_FILE
+
+    stages = STAGES if "all" in args.stage else [s for s in STAGES if s in args.stage]
+    with tempfile.TemporaryDirectory(prefix="ragfmt-bench-") as tmp:
+        work_dir = Path(tmp)
+        if args.corpus:
+            corpus_dir = Path(args.corpus)
+        else:
+            corpus_dir = work_dir / "corpus"
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_corpus(corpus_dir, args.scale, args.seed)
+
+        params = {
+            "corpus": str(corpus_dir),
+            "chunks": str(work_dir / "unified.ndjson"),
+            "work_dir": str(work_dir),
+            "repeat": args.repeat,
+            "pdf": args.pdf,
+            "pages": args.pages,
+            "sentences_per_page": args.sentences_per_page,
+            "target_tokens": args.target_tokens,
+            "overlap_tokens": args.overlap_tokens,
+            "crawl": args.crawl,
+            "entries": args.entries
+        }
+        runner = run_stage if args.in_process else run_isolated
+
+        # Stages over ingested chunks need ingest to have run first
+        if NEEDS_INGEST.intersection(stages) and "ingest" not in stages:
+            runner("ingest", {**params, "repeat": 1})
+
+        results = []
+        for stage in stages:
+            print(f"[BENCH] {stage}...", file=sys.stderr)
+            results.append(runner(stage, params))
+
+        report = {
+            "meta": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "scale": None if args.corpus else args.scale,
+                "seed": None if args.corpus else args.seed,
+                "corpus": describe_corpus(corpus_dir),
+                "repeat": args.repeat,
+                "isolated": not args.in_process
+            },
+            "results": results
+        }
+
+    baseline_path = Path(args.baseline) if args.baseline else BENCH_BASELINE_FILE
+    regressions = []
+    if baseline_path.exists() and not args.save_baseline:
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        if baseline.get("meta", {}).get("corpus") != report["meta"]["corpus"]:
+            print(f"[⚠️] Baseline {baseline_path} was measured on a different corpus", file=sys.stderr)
+        report["baseline"] = str(baseline_path)
+        report["comparison"] = compare_to_baseline(report, baseline, args.tolerance)
+        regressions = [row for row in report["comparison"] if row["regression"]]
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(text + "\n", encoding="utf-8")
+        print(f"[✅] Saved baseline → {baseline_path}", file=sys.stderr)
+
+    for row in regressions:
+        print(f"[❌] {row['stage']} {row['metric']}: {row['baseline']} → {row['current']} ({row['change']:+.0%})", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -5,27 +5,27 @@
 # ----------------------------------------
 # - Walks all .json files in the split/ directory
 # - Warns if any file exceeds 50MB (e.g. for TypingMind)
-# - Prints size in MB + character count
+# - Prints size in MB + chunk / character / token counts
+# - Counts come from split/.split_manifest (O(files)); a file whose
+#   size or mtime no longer matches its entry is re-counted by streaming
 # - Acts as a sanity check after file splitting
 # ----------------------------------------
 
 import os
 import sys
-import json
 import argparse
 from pathlib import Path
 # Import logging setup from config.py
 from config import setup_logging
 
-# Call the setup function to configure logging
-setup_logging()
-
-# Now you can use logging throughout the script
+# Logging is configured in main(), so importing this module has no side effects
 import logging
 
 # Import configured SPLIT_DIR from project root
 sys.path.append(str(Path(__file__).resolve().parents[1]))
-from config import SPLIT_DIR as DEFAULT_DIR
+from config import settings, SPLIT_DIR as DEFAULT_DIR
+from chunk_stream import iter_chunks
+from split_manifest import load_split_manifest, is_fresh
 
 # Max safe size in bytes (50MB threshold)
 MAX_BYTES = 50 * 1024 * 1024
@@ -35,22 +35,38 @@ MAX_BYTES = 50 * 1024 * 1024
 # ----------------------------------------
 def check_file_sizes(directory: Path):
     too_large = []
+    stale = 0
+    manifest = load_split_manifest(directory)
 
     logging.info(f"Checking files in: {directory}")
 
-    for file in directory.glob("*.json"):
-        size_bytes = os.path.getsize(file)
+    for file in sorted(directory.glob("*.json")):
+        st = os.stat(file)
+        size_bytes = st.st_size
         size_mb = round(size_bytes / (1024 * 1024), 2)
 
-        data = json.loads(file.read_text(encoding="utf-8"))
-        char_count = sum(len(c.get("content", "")) for c in data)
-
+        entry = manifest.get(file.name)
+        if is_fresh(entry, st):
+            chunk_count, char_count, tokens = entry["chunks"], entry["chars"], entry.get("tokens")
+        else:
+            # Missing or outdated manifest entry: fall back to a streaming count
+            stale += 1
+            chunk_count = char_count = 0
+            for c in iter_chunks(file):
+                chunk_count += 1
+                char_count += len(c.get("content", ""))
+            tokens = None
+
+        token_info = f"{tokens:>9} tokens" if tokens is not None else f"{'-':>9} tokens"
         tag = "⚠️ OVER 50MB" if size_bytes > MAX_BYTES else "OK"
-        logging.info(f"{file.name:40}  | {size_mb:6} MB  | {char_count:>7} chars  | {tag}")
+        logging.info(f"{file.name:40}  | {size_mb:6} MB  | {chunk_count:>6} chunks  | {char_count:>7} chars  | {token_info}  | {tag}")
 
         if size_bytes > MAX_BYTES:
             too_large.append(file.name)
 
+    if stale:
+        logging.info(f"{stale} file(s) not covered by an up-to-date split manifest were re-counted")
+
     if too_large:
         logging.error("Warning: Some files exceed 50MB and may break LLM tools.")
         sys.exit(1)
@@ -61,11 +77,14 @@ def check_file_sizes(directory: Path):
 # CLI entrypoint
 # ----------------------------------------
 def main():
+    parser = argparse.ArgumentParser(description="Warn if any output .json files are over 50MB.")
+    parser.add_argument("--input", type=str, default=DEFAULT_DIR, help="Directory with split .json files")
+    args = parser.parse_args()
+
+    setup_logging()
     logging.info("Script started: check_split_file_sizes.py")
     try:
-        parser = argparse.ArgumentParser(description="Warn if any output .json files are over 50MB.")
-        parser.add_argument("--input", type=str, default=DEFAULT_DIR, help="Directory with split .json files")
-        args = parser.parse_args()
+        settings.require("check")
 
         target_dir = Path(args.input)
         check_file_sizes(target_dir)
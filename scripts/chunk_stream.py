@@ -0,0 +1,217 @@
+# scripts/chunk_stream.py
+
+# ----------------------------------------
+# Chunk Stream I/O
+# ----------------------------------------
+# Shared helpers for moving chunk lists to and from disk
+# without holding the whole corpus in memory.
+# - NDJSON writer: one chunk per line, appended as it is produced
+# - JSON-array writer: streams the same `indent=2` layout json.dump produces
+# - Readers: yield chunks one at a time from NDJSON or a JSON array
+# ----------------------------------------
+
+import json
+from pathlib import Path
+
+# Characters pulled from disk per read while parsing a JSON array
+READ_BLOCK_CHARS = 1 << 20
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+# ----------------------------------------
+# Serialize one chunk as a single NDJSON line
+# ----------------------------------------
+def dumps_ndjson(chunk: dict) -> str:
+    return json.dumps(chunk, ensure_ascii=False) + "\n"
+
+# ----------------------------------------
+# Serialize one chunk as a pretty-printed JSON array element
+# Matches json.dump(list, indent=2) output byte-for-byte
+# ----------------------------------------
+def dumps_array_item(chunk: dict) -> str:
+    text = json.dumps(chunk, indent=2, ensure_ascii=False)
+    return "  " + text.replace("\n", "\n  ")
+
+# ----------------------------------------
+# Append-only NDJSON writer
+# Each write_many() call is flushed so a crash keeps finished files
+# ----------------------------------------
+class NdjsonWriter:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.count = 0
+        self._fh = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(self.path, "w", encoding="utf-8")
+        return self
+
+    def write(self, chunk: dict):
+        self._fh.write(dumps_ndjson(chunk))
+        self.count += 1
+
+    def write_many(self, chunks):
+        for chunk in chunks:
+            self.write(chunk)
+        self._fh.flush()
+
+    def __exit__(self, exc_type, exc, tb):
+        self._fh.close()
+        self._fh = None
+        return False
+
+# ----------------------------------------
+# Streaming JSON-array writer (compatibility output)
+# Produces the same file json.dump(chunks, indent=2) would
+# ----------------------------------------
+class JsonArrayWriter:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.count = 0
+        self._fh = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(self.path, "w", encoding="utf-8")
+        self._fh.write("[")
+        return self
+
+    def write(self, chunk: dict):
+        self._fh.write(",\n" if self.count else "\n")
+        self._fh.write(dumps_array_item(chunk))
+        self.count += 1
+
+    def write_many(self, chunks):
+        for chunk in chunks:
+            self.write(chunk)
+        self._fh.flush()
+
+    def __exit__(self, exc_type, exc, tb):
+        self._fh.write("\n]" if self.count else "]")
+        self._fh.close()
+        self._fh = None
+        return False
+
+# ----------------------------------------
+# Convert an NDJSON file to a JSON array, one line at a time
+# ----------------------------------------
+def ndjson_to_json_array(src: Path, dst: Path) -> int:
+    with open(src, "r", encoding="utf-8") as f, JsonArrayWriter(dst) as out:
+        for line in f:
+            if line.strip():
+                out.write(json.loads(line))
+        return out.count
+
+# ----------------------------------------
+# Pick a writer from the output file extension
+# .ndjson / .jsonl → NDJSON, anything else → JSON array
+# ----------------------------------------
+def open_chunk_writer(path: Path):
+    if Path(path).suffix.lower() in (".ndjson", ".jsonl"):
+        return NdjsonWriter(path)
+    return JsonArrayWriter(path)
+
+# ----------------------------------------
+# Peek at the first non-whitespace character of a file
+# ----------------------------------------
+def _first_char(path: Path) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            block = f.read(4096)
+            if not block:
+                return ""
+            stripped = block.lstrip(_WHITESPACE + "\ufeff")
+            if stripped:
+                return stripped[0]
+
+# ----------------------------------------
+# Yield chunks from an NDJSON file, one line at a time
+# ----------------------------------------
+def iter_ndjson(path: Path):
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid NDJSON on line {lineno}: {e.msg}") from e
+
+# ----------------------------------------
+# Yield elements of a top-level JSON array incrementally
+# Only the current element (plus one read block) is ever in memory
+# ----------------------------------------
+def iter_json_array(path: Path, block_chars: int = READ_BLOCK_CHARS):
+    with open(path, "r", encoding="utf-8-sig") as f:
+        buf = f.read(block_chars)
+        eof = not buf
+        pos = 0
+
+        def fill():
+            nonlocal buf, pos, eof
+            block = f.read(block_chars)
+            if not block:
+                eof = True
+                return False
+            buf = buf[pos:] + block
+            pos = 0
+            return True
+
+        def skip_ws():
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos] in _WHITESPACE:
+                    pos += 1
+                if pos < len(buf) or not fill():
+                    return
+
+        skip_ws()
+        if pos >= len(buf) or buf[pos] != "[":
+            raise ValueError("Top-level JSON object is not a list.")
+        pos += 1
+
+        index = 0
+        while True:
+            skip_ws()
+            if pos >= len(buf):
+                raise ValueError("Unexpected end of file inside JSON array.")
+            if buf[pos] == "]":
+                # Only whitespace may follow the closing bracket
+                pos += 1
+                skip_ws()
+                if pos < len(buf):
+                    raise ValueError("Extra data after the top-level JSON array.")
+                return
+            if index:
+                if buf[pos] != ",":
+                    raise ValueError(f"Expected ',' after array element {index - 1}.")
+                pos += 1
+                skip_ws()
+
+            # Decode one element, pulling more text until it is complete.
+            # An element that ends exactly at the buffer edge may be a
+            # truncated scalar, so read on before trusting it.
+            while True:
+                try:
+                    item, end = _decoder.raw_decode(buf, pos)
+                    if end < len(buf) or eof:
+                        break
+                except json.JSONDecodeError as e:
+                    if eof:
+                        raise ValueError(f"Invalid JSON in array element {index}: {e.msg}") from e
+                if not fill():
+                    continue
+            pos = end
+            index += 1
+            yield item
+
+# ----------------------------------------
+# Yield chunks from either format, detected from the first character
+# ----------------------------------------
+def iter_chunks(path: Path):
+    if _first_char(path) == "[":
+        yield from iter_json_array(path)
+    else:
+        yield from iter_ndjson(path)
@@ -11,8 +11,6 @@
 # Output: Cleaned version of unified.json → unified-clean.json
 # ----------------------------------------
 
-import json
-import re
 import argparse
 import sys
 from pathlib import Path
@@ -20,24 +18,20 @@ from pathlib import Path
 # Import logging setup from config.py
 from config import setup_logging
 
-# Call the setup function to configure logging
-setup_logging()
-
-# Now you can use logging throughout the script
+# Logging is configured in main(), so importing this module has no side effects
 import logging
 
 # Import canonical paths from config
 sys.path.append(str(Path(__file__).resolve().parents[1]))
-from config import FULL_OUTPUT_FILE, CLEAN_FULL_OUTPUT_FILE
+from config import settings, FULL_OUTPUT_FILE, CLEAN_FULL_OUTPUT_FILE
+from chunk_stream import iter_chunks, open_chunk_writer
+from text_normalize import clean_chunk_text
 
 # ----------------------------------------
 # Utility: Clean raw content text
+# Removes markdown images + inline HTML tags, normalizes whitespace
 # ----------------------------------------
-def clean_text(text: str) -> str:
-    text = re.sub(r"!\[[^\]]*\]\([^)]+\)", "", text)         # remove markdown images
-    text = re.sub(r"<[^>]+>", "", text)                      # remove inline HTML tags
-    text = re.sub(r"\s+", " ", text)                         # normalize whitespace
-    return text.strip()
+clean_text = clean_chunk_text
 
 # ----------------------------------------
 # Apply cleaning to a single chunk object
@@ -65,6 +59,10 @@ def clean_chunk(chunk: dict) -> dict | None:
         "doc_id": meta.get("doc_id")
     }
 
+    # Markdown sections carry their heading trail from smart_ingest
+    if meta.get("heading_path"):
+        base["metadata"]["heading_path"] = meta["heading_path"]
+
     return base
 
 
@@ -72,28 +70,27 @@ def clean_chunk(chunk: dict) -> dict | None:
 # Entry Point
 # ----------------------------------------
 def main():
+    parser = argparse.ArgumentParser(description="Clean and filter raw JSON chunks.")
+    parser.add_argument("--input", type=str, default=FULL_OUTPUT_FILE, help="Path to raw unified.json")
+    parser.add_argument("--output", type=str, default=CLEAN_FULL_OUTPUT_FILE, help="Path to save cleaned output")
+    args = parser.parse_args()
+
+    setup_logging()
     logging.info("Script started: clean_json_chunks.py")
     try:
-        parser = argparse.ArgumentParser(description="Clean and filter raw JSON chunks.")
-        parser.add_argument("--input", type=str, default=FULL_OUTPUT_FILE, help="Path to raw unified.json")
-        parser.add_argument("--output", type=str, default=CLEAN_FULL_OUTPUT_FILE, help="Path to save cleaned output")
-        args = parser.parse_args()
+        settings.require("clean")
 
         input_path = Path(args.input)
         output_path = Path(args.output)
 
-        raw_chunks = json.loads(input_path.read_text(encoding="utf-8"))
-        cleaned_chunks = []
-
-        for chunk in raw_chunks:
-            cleaned = clean_chunk(chunk)
-            if cleaned:
-                cleaned_chunks.append(cleaned)
-
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(cleaned_chunks, f, indent=2, ensure_ascii=False)
+        # Stream chunks through the cleaner one at a time (constant memory)
+        with open_chunk_writer(output_path) as writer:
+            for chunk in iter_chunks(input_path):
+                cleaned = clean_chunk(chunk)
+                if cleaned:
+                    writer.write(cleaned)
 
-        logging.info(f"Cleaned {len(cleaned_chunks)} chunks → {output_path}")
+        logging.info(f"Cleaned {writer.count} chunks → {output_path}")
     except Exception as e:
         logging.error(f"Script failed: clean_json_chunks.py, Error: {str(e)}")
         raise
@@ -0,0 +1,158 @@
+# scripts/dedup.py
+
+# ----------------------------------------
+# Chunk Deduplication
+# ----------------------------------------
+# Streaming duplicate detector used by filter_chunks.py / run_pipeline.py
+# - Exact pass: 64-bit hash of normalized text (lowercased words)
+# - Near pass: MinHash signatures over word shingles + LSH banding,
+#   candidates confirmed by estimated Jaccard >= threshold
+# Signatures are computed with vectorized NumPy.
+# The index is bounded: once it holds max_entries chunks, the oldest are
+# evicted first (FIFO), so a duplicate is only caught within the last
+# max_entries unique chunks. At the defaults (64 perms → 7 bands) one
+# indexed chunk costs ~1.1 KB: exact hash ~100 B, signature num_perm * 4 B,
+# band keys and band-table entries ~100 B per band. 1M entries ≈ 1.1 GB.
+# ----------------------------------------
+
+import re
+import zlib
+import hashlib
+from collections import deque
+import numpy as np
+
+# Defaults (overridable from the filter CLI)
+NEAR_DUP_THRESHOLD = 0.85
+NUM_PERM = 64
+SHINGLE_WORDS = 5
+MAX_INDEX_ENTRIES = 1_000_000  # 0 = unbounded
+
+_WORD = re.compile(r"\w+")
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# ----------------------------------------
+# Choose LSH bands/rows minimising weighted false positives/negatives
+# around the threshold (same approach as datasketch's _optimal_param).
+# Candidates are verified against stored signatures, so misses cost more
+# than spurious candidates and false negatives are weighted heavier.
+# ----------------------------------------
+def optimal_bands(threshold: float, num_perm: int, fp_weight: float = 0.1, fn_weight: float = 0.9) -> tuple:
+    def area(f, lo, hi, steps=100):
+        step = (hi - lo) / steps
+        return sum(f(lo + (i + 0.5) * step) for i in range(steps)) * step
+
+    best, best_err = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        if rows == 0:
+            continue
+        fp = area(lambda s: 1 - (1 - s ** rows) ** bands, 0.0, threshold)
+        fn = area(lambda s: (1 - s ** rows) ** bands, threshold, 1.0)
+        err = fp_weight * fp + fn_weight * fn
+        if err < best_err:
+            best, best_err = (bands, rows), err
+    return best
+
+class Deduplicator:
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD, num_perm: int = NUM_PERM,
+                 near: bool = True, shingle_words: int = SHINGLE_WORDS, seed: int = 1,
+                 max_entries: int = MAX_INDEX_ENTRIES):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.near = near
+        self.shingle_words = shingle_words
+        self.max_entries = max_entries
+        self.stats = {"exact": 0, "near": 0, "evicted": 0}
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64) % _MERSENNE
+        self._b = rng.randint(0, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64) % _MERSENNE
+        # Rolling multipliers to fold k word hashes into one shingle hash
+        self._mult = np.array([pow(1_000_003, j, 1 << 64) for j in range(shingle_words)], dtype=np.uint64)
+
+        self.bands, self.rows = optimal_bands(threshold, num_perm)
+        self._tables = [dict() for _ in range(self.bands)]
+        self._exact = set()
+        self._exact_order = deque()
+        # Signatures and band keys live in ring buffers of up to max_entries slots
+        size = min(1024, max_entries) if max_entries > 0 else 1024
+        self._sigs = np.empty((size, num_perm), dtype=np.uint32)
+        self._keys = np.empty((size, self.bands), dtype=np.int64)
+        self._count = 0
+
+    # ----------------------------------------
+    # Vectorized MinHash signature of one text's word shingles
+    # ----------------------------------------
+    def signature(self, words: list) -> np.ndarray:
+        hv = np.fromiter((zlib.crc32(w.encode("utf-8")) for w in words), dtype=np.uint64, count=len(words))
+        k = min(self.shingle_words, len(hv))
+        n = len(hv) - k + 1
+        shingles = np.zeros(n, dtype=np.uint64)
+        for j in range(k):
+            shingles += hv[j:j + n] * self._mult[j]  # wraps mod 2**64 by design
+        shingles &= _MAX_HASH
+
+        phv = (shingles[:, None] * self._a[None, :] + self._b[None, :]) % _MERSENNE
+        return (phv & _MAX_HASH).min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, sig: np.ndarray) -> list:
+        r = self.rows
+        return [hash(sig[i * r:(i + 1) * r].tobytes()) for i in range(self.bands)]
+
+    def _remember_exact(self, key: int):
+        self._exact.add(key)
+        self._exact_order.append(key)
+        if self.max_entries > 0 and len(self._exact_order) > self.max_entries:
+            self._exact.discard(self._exact_order.popleft())
+
+    def _remember(self, sig: np.ndarray, keys: list):
+        size = len(self._sigs)
+        if self._count == size and (self.max_entries <= 0 or size < self.max_entries):
+            grow = size if self.max_entries <= 0 else min(size, self.max_entries - size)
+            self._sigs = np.concatenate([self._sigs, np.empty((grow, self.num_perm), dtype=np.uint32)])
+            self._keys = np.concatenate([self._keys, np.empty((grow, self.bands), dtype=np.int64)])
+            size = len(self._sigs)
+
+        slot = self._count % size
+        if self._count >= size:
+            # Ring is full: drop the oldest signature's band entries before reusing its slot
+            for table, key in zip(self._tables, self._keys[slot].tolist()):
+                if table.get(key) == slot:
+                    del table[key]
+            self.stats["evicted"] += 1
+
+        self._sigs[slot] = sig
+        self._keys[slot] = keys
+        for table, key in zip(self._tables, keys):
+            table[key] = slot
+        self._count += 1
+
+    # ----------------------------------------
+    # Return "exact", "near" or None; non-duplicates are indexed
+    # ----------------------------------------
+    def check(self, text: str) -> str | None:
+        words = _WORD.findall(text.lower())
+        if not words:
+            return None
+
+        digest = hashlib.blake2b(" ".join(words).encode("utf-8"), digest_size=8).digest()
+        key = int.from_bytes(digest, "little")
+        if key in self._exact:
+            self.stats["exact"] += 1
+            return "exact"
+        self._remember_exact(key)
+
+        if not self.near:
+            return None
+
+        sig = self.signature(words)
+        keys = self._band_keys(sig)
+        candidates = {table[k] for table, k in zip(self._tables, keys) if k in table}
+        for idx in candidates:
+            if np.count_nonzero(self._sigs[idx] == sig) >= self.threshold * self.num_perm:
+                self.stats["near"] += 1
+                return "near"
+
+        self._remember(sig, keys)
+        return None
@@ -5,31 +5,31 @@
 # ----------------------------------------
 # - Strips legal boilerplate, disclaimers, navigation junk
 # - Drops chunks with known non-informative patterns
+# - Deduplicates exact and near-identical chunks (see dedup.py)
 # - Preserves useful metadata + markdown
 # ----------------------------------------
 
-import json
 import re
 import argparse
 import sys
 from pathlib import Path
+from collections import Counter
 
 # Import logging setup from config.py
 from config import setup_logging
 
-# Call the setup function to configure logging
-setup_logging()
-
-# Now you can use logging throughout the script
+# Logging is configured in main(), so importing this module has no side effects
 import logging
 
 # Import config paths
 sys.path.append(str(Path(__file__).resolve().parents[1]))
-from config import CLEAN_FULL_OUTPUT_FILE, FULL_OUTPUT_FILE
+from config import settings, CLEAN_FULL_OUTPUT_FILE, FULL_OUTPUT_FILE
+from chunk_stream import iter_chunks, open_chunk_writer
+from dedup import Deduplicator, NEAR_DUP_THRESHOLD, NUM_PERM, MAX_INDEX_ENTRIES
 
 # ----------------------------------------
 # Known junk phrases to remove
-# Expand this list to refine filtering
+# Built-in defaults; add your own to JUNK_PATTERNS_FILE (junk_patterns.txt)
 # ----------------------------------------
 JUNK_PATTERNS = [
     r"(?i)all rights reserved",
@@ -44,42 +44,163 @@ JUNK_PATTERNS = [
     r"(?i)accept cookies"
 ]
 
+# ----------------------------------------
+# Load patterns from a file: one regex per line, "#" starts a comment
+# Falls back to the built-in JUNK_PATTERNS if the file does not exist
+# ----------------------------------------
+def load_junk_patterns(path: Path | None = None) -> list:
+    path = Path(path) if path else settings.JUNK_PATTERNS_FILE
+    if not path.exists():
+        return list(JUNK_PATTERNS)
+    lines = path.read_text(encoding="utf-8").splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.lstrip().startswith("#")]
+
+# Leading inline flag group, e.g. "(?i)" or "(?sm)"
+LEADING_FLAGS = re.compile(r"^\(\?([aiLmsux]+)\)")
+
+# Backreferences and conditionals depend on group numbers/names,
+# which change once a pattern is embedded in the alternation
+GROUP_REFS = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+# Turn leading inline flags into a scoped group: "(?s)a.b" → "(?s:a.b)"
+def scope_flags(pattern: str) -> str:
+    flags = ""
+    m = LEADING_FLAGS.match(pattern)
+    while m:
+        flags += m.group(1)
+        pattern = pattern[m.end():]
+        m = LEADING_FLAGS.match(pattern)
+    return f"(?{flags}:{pattern})" if flags else pattern
+
+# ----------------------------------------
+# All patterns compiled into one alternation, matched in a single scan
+# Each pattern gets a named group so hits can be attributed and counted.
+# Invalid patterns are skipped with a warning; patterns that cannot be
+# embedded (backreferences, named groups, flags that don't scope) are
+# matched on their own after the alternation.
+# ----------------------------------------
+class JunkMatcher:
+    def __init__(self, patterns: list):
+        self.patterns = []
+        self.hits = Counter()
+        self.checked = 0
+        self._separate = []
+
+        alternatives = []
+        for pat in patterns:
+            try:
+                compiled = re.compile(pat)
+            except re.error as e:
+                logging.warning(f"Skipping invalid junk pattern {pat!r}: {str(e)}")
+                continue
+            i = len(self.patterns)
+            self.patterns.append(pat)
+
+            if compiled.groupindex or GROUP_REFS.search(pat):
+                self._separate.append((pat, compiled))
+                continue
+            scoped = scope_flags(pat)
+            try:
+                re.compile(scoped)
+            except re.error:
+                self._separate.append((pat, compiled))
+                continue
+            alternatives.append(f"(?P<p{i}>{scoped})")
+        self._regex = re.compile("|".join(alternatives)) if alternatives else None
+
+    # Return the pattern that matched first, or None
+    def search(self, text: str) -> str | None:
+        self.checked += 1
+        m = self._regex.search(text) if self._regex else None
+        if m:
+            pattern = self.patterns[int(m.lastgroup[1:])]
+        else:
+            pattern = next((pat for pat, regex in self._separate if regex.search(text)), None)
+            if pattern is None:
+                return None
+        self.hits[pattern] += 1
+        return pattern
+
+    def __call__(self, text: str) -> bool:
+        return self.search(text) is not None
+
+    # Log per-pattern hit counts (including zero-hit patterns worth pruning)
+    def report(self):
+        logging.info(f"Junk pattern hits over {self.checked} chunk(s):")
+        for pattern in self.patterns:
+            logging.info(f"  {self.hits[pattern]:>8}  {pattern}")
+
+_matcher = None
+
+def get_junk_matcher() -> JunkMatcher:
+    global _matcher
+    if _matcher is None:
+        _matcher = JunkMatcher(load_junk_patterns())
+    return _matcher
+
 # ----------------------------------------
 # Return True if a chunk should be excluded
 # ----------------------------------------
 def is_junk(text: str) -> bool:
-    return any(re.search(pat, text) for pat in JUNK_PATTERNS)
+    return get_junk_matcher()(text)
+
+# ----------------------------------------
+# Shared CLI options for deduplication (also used by run_pipeline.py)
+# ----------------------------------------
+def add_dedup_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--no-dedup", action="store_true", help="Disable exact and near-duplicate removal")
+    parser.add_argument("--no-near-dedup", action="store_true", help="Only drop exact duplicates (skip MinHash/LSH)")
+    parser.add_argument("--near-threshold", type=float, default=NEAR_DUP_THRESHOLD,
+                        help=f"Jaccard similarity at which chunks count as near-duplicates (default: {NEAR_DUP_THRESHOLD})")
+    parser.add_argument("--num-perm", type=int, default=NUM_PERM, help=f"MinHash permutations (default: {NUM_PERM})")
+    parser.add_argument("--dedup-max-entries", type=int, default=MAX_INDEX_ENTRIES,
+                        help=f"Chunks kept in the dedup index before the oldest are evicted, ~1.1 KB each "
+                             f"(default: {MAX_INDEX_ENTRIES}; 0 = unbounded)")
+
+def build_deduplicator(args) -> Deduplicator | None:
+    if args.no_dedup:
+        return None
+    return Deduplicator(threshold=args.near_threshold, num_perm=args.num_perm, near=not args.no_near_dedup,
+                        max_entries=args.dedup_max_entries)
 
 # ----------------------------------------
 # Entry point
 # ----------------------------------------
 def main():
+    parser = argparse.ArgumentParser(description="Filter boilerplate from chunks.")
+    parser.add_argument("--input", type=str, default=CLEAN_FULL_OUTPUT_FILE, help="Path to cleaned file")
+    parser.add_argument("--output", type=str, default=FULL_OUTPUT_FILE.parent / "filtered.json", help="Filtered output path")
+    parser.add_argument("--junk-patterns", type=str, default=None,
+                        help="File with one junk regex per line (default: REPO_ROOT/junk_patterns.txt)")
+    add_dedup_args(parser)
+    args = parser.parse_args()
+
+    setup_logging()
     logging.info("Script started: filter_chunks.py")
     try:
-        parser = argparse.ArgumentParser(description="Filter boilerplate from chunks.")
-        parser.add_argument("--input", type=str, default=CLEAN_FULL_OUTPUT_FILE, help="Path to cleaned file")
-        parser.add_argument("--output", type=str, default=FULL_OUTPUT_FILE.parent / "filtered.json", help="Filtered output path")
-        args = parser.parse_args()
+        settings.require("filter")
 
         input_path = Path(args.input)
         output_path = Path(args.output)
 
-        # Read cleaned chunks from disk
-        chunks = json.loads(input_path.read_text(encoding="utf-8"))
-        kept = []
-
-        # Drop empty or junk-matching content
-        for chunk in chunks:
-            content = chunk.get("content", "")
-            if not content or is_junk(content):
-                continue
-            kept.append(chunk)
+        global _matcher
+        _matcher = JunkMatcher(load_junk_patterns(args.junk_patterns))
+        dedup = build_deduplicator(args)
 
-        # Write back to disk
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(kept, f, indent=2, ensure_ascii=False)
+        # Stream cleaned chunks from disk, dropping empty, junk-matching or duplicate content
+        with open_chunk_writer(output_path) as writer:
+            for chunk in iter_chunks(input_path):
+                content = chunk.get("content", "")
+                if not content or is_junk(content):
+                    continue
+                if dedup and dedup.check(content):
+                    continue
+                writer.write(chunk)
 
-        logging.info(f"Filtered {len(kept)} chunks → {output_path}")
+        _matcher.report()
+        if dedup:
+            logging.info(f"Dropped {dedup.stats['exact']} exact and {dedup.stats['near']} near-duplicate chunks")
+        logging.info(f"Filtered {writer.count} chunks → {output_path}")
     except Exception as e:
         logging.error(f"Script failed: filter_chunks.py, Error: {str(e)}")
         raise
@@ -0,0 +1,132 @@
+# scripts/ingest_manifest.py
+
+# ----------------------------------------
+# Incremental Ingestion Manifest
+# ----------------------------------------
+# Remembers every ingested source file (hash, size, mtime) together
+# with a cached NDJSON copy of the chunks it produced.
+# - Unchanged files are detected by size + mtime, then by content hash
+# - Only new or changed files need to be re-parsed
+# - Deleted files have their cached chunks dropped
+# - Unified output is rebuilt by concatenating the per-file caches
+# ----------------------------------------
+
+import json
+import shutil
+import hashlib
+from pathlib import Path
+
+from chunk_stream import NdjsonWriter
+
+# Bump when process_file output changes shape so old caches are discarded
+MANIFEST_VERSION = 1
+
+# ----------------------------------------
+# Stream a file through sha256
+# ----------------------------------------
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class IngestManifest:
+    def __init__(self, cache_dir: Path, source_root: Path, settings: dict):
+        self.cache_dir = Path(cache_dir)
+        self.source_root = Path(source_root)
+        self.path = self.cache_dir / "manifest.json"
+        self.settings = {"version": MANIFEST_VERSION, **settings}
+        self.entries = {}
+        self.load()
+
+    # ----------------------------------------
+    # Load manifest; discard it if chunking settings changed
+    # ----------------------------------------
+    def load(self):
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return
+        if data.get("settings") != self.settings:
+            return
+        self.entries = data.get("files", {})
+
+    # Write to a temp file first so an interrupted save never corrupts the manifest
+    def save(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps({"settings": self.settings, "files": self.entries}, indent=2), encoding="utf-8")
+        tmp.replace(self.path)
+
+    def key(self, path: Path) -> str:
+        return path.relative_to(self.source_root).as_posix()
+
+    def cache_path(self, key: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.ndjson"
+
+    # ----------------------------------------
+    # Return True if the file's cached chunks are still valid
+    # Cheap stat check first; hash only when size/mtime moved
+    # ----------------------------------------
+    def is_current(self, path: Path) -> bool:
+        entry = self.entries.get(self.key(path))
+        if not entry or not self.cache_path(self.key(path)).exists():
+            return False
+
+        stat = path.stat()
+        if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            return True
+        if entry["size"] != stat.st_size:
+            return False
+
+        # Touched but same size: confirm by content hash
+        if file_sha256(path) == entry["sha256"]:
+            entry["mtime"] = stat.st_mtime_ns
+            return True
+        return False
+
+    # Cache a freshly processed file's chunks and record its fingerprint
+    def store(self, path: Path, chunks: list):
+        key = self.key(path)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with NdjsonWriter(self.cache_path(key)) as writer:
+            writer.write_many(chunks)
+        stat = path.stat()
+        self.entries[key] = {
+            "sha256": file_sha256(path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime_ns,
+            "chunks": writer.count
+        }
+
+    # Forget a file (deleted from source or failed to process)
+    def forget(self, key: str):
+        self.entries.pop(key, None)
+        self.cache_path(key).unlink(missing_ok=True)
+
+    # Drop entries whose source file no longer exists; returns removed keys
+    def prune(self, paths: list) -> list:
+        live = {self.key(path) for path in paths}
+        removed = [key for key in self.entries if key not in live]
+        for key in removed:
+            self.forget(key)
+        return removed
+
+    # ----------------------------------------
+    # Rebuild unified NDJSON by concatenating per-file caches in order
+    # ----------------------------------------
+    def write_unified(self, paths: list, output_path: Path) -> int:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        total = 0
+        with open(output_path, "wb") as out:
+            for path in paths:
+                key = self.key(path)
+                if key not in self.entries:
+                    continue
+                with open(self.cache_path(key), "rb") as f:
+                    shutil.copyfileobj(f, out)
+                total += self.entries[key]["chunks"]
+        return total
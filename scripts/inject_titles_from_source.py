@@ -3,50 +3,72 @@
 # ----------------------------------------
 # Metadata Title Injector
 # ----------------------------------------
-# Adds `metadata.title` to each chunk if not already present.
+# Adds `metadata.title` to each chunk if missing or empty.
 # Title is inferred from:
 #   - metadata.url (slugified path)
 #   - source filename (fallback)
-# Only updates chunks that are missing a title.
+# Normally runs in-stream inside run_pipeline.py (title_stage), so
+# split/ is written exactly once; the CLI patches existing split files.
 # ----------------------------------------
 
-import os
 import sys
-import json
-import logging
 from pathlib import Path
+from functools import lru_cache
 
 # Import logging setup from config.py
-from config import setup_logging, REPO_ROOT
-
-# Call the setup function to configure logging
-setup_logging()
+from config import setup_logging
 
-# Now you can use logging throughout the script
+# Logging is configured in main(), so importing this module has no side effects
 import logging
 
-# Create logs in this step of the pipeline dynamically
-logging.basicConfig(
-    filename=log_file_path,  # Path to your log file
-    level=logging.INFO,  # Log everything at INFO level and above
-    format='%(asctime)s - %(message)s'  # Format with a timestamp
-)
-
 # Import configured split directory
 sys.path.append(str(Path(__file__).resolve().parents[1]))
-from config import SPLIT_DIR as TARGET_DIR
+from config import settings, SPLIT_DIR as TARGET_DIR
+from chunk_stream import iter_json_array, JsonArrayWriter
 
 # ----------------------------------------
 # Generate a title slug from a URL or filename
 # e.g. "/docs/setup/index.html" → "setup"
+# Memoized: crawls repeat the same URL across many chunks
 # ----------------------------------------
+@lru_cache(maxsize=65536)
 def infer_title_from_url(url: str) -> str:
     path = Path(url).name or Path(url).parent.name
     name = path.lower().replace("-", " ").replace("_", " ")
     return name.strip()
 
 # ----------------------------------------
-# Inject `metadata.title` if missing
+# Fill `metadata.title` if missing or empty (clean_chunk sets it to None)
+# Returns True if the chunk was modified
+# ----------------------------------------
+def fill_title(chunk: dict) -> bool:
+    # "metadata": null passes validation, so treat it like a missing dict
+    metadata = chunk.get("metadata") or {}
+    chunk["metadata"] = metadata
+    if metadata.get("title"):
+        return False
+
+    # Priority 1: Infer from metadata.url
+    if metadata.get("url"):
+        metadata["title"] = infer_title_from_url(metadata["url"])
+    else:
+        # Fallback: Use source file stem
+        metadata["title"] = Path(chunk.get("source", "unknown")).stem
+    return True
+
+# ----------------------------------------
+# Enrichment stage: fill titles in-stream before chunks are split
+# ----------------------------------------
+def title_stage(chunks, stats: dict):
+    for chunk in chunks:
+        if fill_title(chunk):
+            stats["titled"] += 1
+        yield chunk
+
+# ----------------------------------------
+# Inject `metadata.title` into already-split files
+# Only needed for split/ output produced without run_pipeline.py;
+# files with nothing to fill are left untouched
 # ----------------------------------------
 def inject_titles(directory: Path):
     modified_count = 0
@@ -54,26 +76,17 @@ def inject_titles(directory: Path):
     logging.info(f"Injecting titles in directory: {directory}")
 
     for file in directory.glob("*.json"):
-        data = json.loads(file.read_text(encoding="utf-8"))
-        updated = []
-
-        for chunk in data:
-            metadata = chunk.get("metadata", {})
-
-            if "title" not in metadata:
-                # Priority 1: Infer from metadata.url
-                if "url" in metadata:
-                    metadata["title"] = infer_title_from_url(metadata["url"])
-                else:
-                    # Fallback: Use source file stem
-                    metadata["title"] = Path(chunk.get("source", "unknown")).stem
-
-                modified_count += 1
-
-            chunk["metadata"] = metadata
-            updated.append(chunk)
-
-        file.write_text(json.dumps(updated, indent=2, ensure_ascii=False), encoding="utf-8")
+        if not any(not (c.get("metadata") or {}).get("title") for c in iter_json_array(file)):
+            continue
+
+        # Stream into a temp file and swap it in atomically
+        tmp = file.with_name(file.name + ".tmp")
+        with JsonArrayWriter(tmp) as writer:
+            for chunk in iter_json_array(file):
+                if fill_title(chunk):
+                    modified_count += 1
+                writer.write(chunk)
+        tmp.replace(file)
 
     logging.info(f"Injected titles into {modified_count} chunk(s)")
 
@@ -81,8 +94,11 @@ def inject_titles(directory: Path):
 # CLI entrypoint
 # ----------------------------------------
 def main():
+    setup_logging()
     logging.info("Script started: inject_titles_from_source.py")
     try:
+        settings.require("titles")
+
         inject_titles(TARGET_DIR)
         logging.info("Script finished successfully: inject_titles_from_source.py")
     except Exception as e:
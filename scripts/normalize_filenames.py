@@ -20,15 +20,12 @@ from pathlib import Path
 # Import logging setup from config.py
 from config import setup_logging
 
-# Call the setup function to configure logging
-setup_logging()
-
-# Now you can use logging throughout the script
+# Logging is configured in main(), so importing this module has no side effects
 import logging
 
-# Load ingestion source directory from config
+# Load ingestion source directory from config (resolved when first used)
 sys.path.append(str(Path(__file__).resolve().parents[1]))
-from config import INGESTION_SOURCE
+from config import settings
 
 # ----------------------------------------
 # Convert filename to snake_case and strip unsafe characters
@@ -45,12 +42,13 @@ def normalize_filename(name: str) -> str:
 # Walk ingestion directory and rename files
 # ----------------------------------------
 def normalize_filenames(dry_run=False):
-    files = list(INGESTION_SOURCE.glob("*.*"))
+    source = settings.INGESTION_SOURCE
+    files = list(source.glob("*.*"))
     if not files:
-        print(f"[INFO] No files found in {INGESTION_SOURCE}")
+        print(f"[INFO] No files found in {source}")
         return
 
-    print(f"\n[🔁] Normalizing filenames in: {INGESTION_SOURCE}\n")
+    print(f"\n[🔁] Normalizing filenames in: {source}\n")
 
     for path in files:
         if not path.is_file():
@@ -72,11 +70,14 @@ def normalize_filenames(dry_run=False):
 # CLI entrypoint
 # ----------------------------------------
 def main():
+    parser = argparse.ArgumentParser(description="Standardize filenames to safe snake_case.")
+    parser.add_argument("--dry-run", action="store_true", help="Preview changes without renaming files")
+    args = parser.parse_args()
+
+    setup_logging()
     logging.info("Script started: normalize_filenames.py")
     try:
-        parser = argparse.ArgumentParser(description="Standardize filenames to safe snake_case.")
-        parser.add_argument("--dry-run", action="store_true", help="Preview changes without renaming files")
-        args = parser.parse_args()
+        settings.require("normalize")
 
         normalize_filenames(dry_run=args.dry_run)
         logging.info("Script finished successfully: normalize_filenames.py")
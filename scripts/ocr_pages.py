@@ -0,0 +1,135 @@
+# scripts/ocr_pages.py
+
+# ----------------------------------------
+# Optional OCR for Image-Only PDF Pages
+# ----------------------------------------
+# Reads full/ocr_queue.ndjson (written by smart_ingest.py from the
+# precheck page index) and OCRs each queued page with a local Tesseract
+# install through PyMuPDF's get_textpage_ocr.
+# - Runs separately so scanned pages never slow down the text path
+# - PDFs are OCR'd in parallel worker processes
+# - Chunks land in full/ocr.ndjson with the same metadata as text pages
+#   (plus "ocr": true); `make process OCR=1` feeds them to the pipeline
+# Requires the `tesseract` binary and TESSDATA_PREFIX pointing at its
+# tessdata folder (or --tessdata).
+# ----------------------------------------
+
+import os
+import sys
+import shutil
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+# Import logging setup from config.py
+from config import setup_logging
+
+# Logging is configured in main(), so importing this module has no side effects
+import logging
+
+# Load config from project root
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from config import settings, OCR_QUEUE_FILE, OCR_OUTPUT_NDJSON, OCR_LANGUAGE, OCR_DPI, TARGET_TOKENS, OVERLAP_TOKENS, TOKENIZER
+from chunk_stream import iter_ndjson, NdjsonWriter
+from token_counter import require_token_counter
+
+# ----------------------------------------
+# Group queued pages by PDF, keeping queue order
+# ----------------------------------------
+def load_queue(queue_path: Path) -> dict:
+    pages = {}
+    if not queue_path.exists():
+        return pages
+    for record in iter_ndjson(queue_path):
+        pages.setdefault(record["path"], []).append(record)
+    return pages
+
+# ----------------------------------------
+# OCR the queued pages of one PDF → (path, chunks, error)
+# Never raises, so one bad file does not stop the run
+# ----------------------------------------
+def ocr_file(task: tuple) -> tuple:
+    path, records, language, dpi, tessdata = task
+    import fitz
+    from smart_ingest import chunk_sentences, clean_text
+
+    chunks = []
+    try:
+        with fitz.open(path) as doc:
+            for record in records:
+                page = doc[record["page_number"] - 1]
+                textpage = page.get_textpage_ocr(language=language, dpi=dpi, full=True, tessdata=tessdata)
+                text = clean_text(page.get_text(textpage=textpage))
+                meta = {**record["metadata"], "ocr": True}
+                chunks.extend(chunk_sentences(text, TARGET_TOKENS, OVERLAP_TOKENS, meta))
+        return path, chunks, None
+    except Exception as e:
+        return path, [], f"{type(e).__name__}: {e}"
+
+# ----------------------------------------
+# CLI entrypoint
+# ----------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="OCR image-only PDF pages queued during ingestion.")
+    parser.add_argument("--queue", type=str, default=OCR_QUEUE_FILE, help="OCR queue (NDJSON) from smart_ingest.py")
+    parser.add_argument("--output", type=str, default=OCR_OUTPUT_NDJSON, help="Output NDJSON for OCR'd chunks")
+    parser.add_argument("--language", type=str, default=OCR_LANGUAGE, help="Tesseract language(s), e.g. eng or eng+deu")
+    parser.add_argument("--dpi", type=int, default=OCR_DPI, help="Render resolution for OCR")
+    parser.add_argument("--tessdata", type=str, default=None, help="Tesseract tessdata folder (default: TESSDATA_PREFIX)")
+    parser.add_argument("--workers", type=int, default=0, help="Parallel PDFs (default: 0 = all CPU cores)")
+    args = parser.parse_args()
+
+    setup_logging()
+    logging.info("Script started: ocr_pages.py")
+    try:
+        settings.require("ocr")
+
+        queue = load_queue(Path(args.queue))
+        if not queue:
+            # Leave an empty output so OCR chunks from an earlier run are not merged in again
+            with NdjsonWriter(Path(args.output)):
+                pass
+            logging.info(f"No pages queued for OCR in {args.queue}")
+            print("[✅] Nothing to OCR.")
+            return
+
+        if not shutil.which("tesseract"):
+            raise RuntimeError("tesseract not found on PATH; install Tesseract to OCR image-only pages")
+        require_token_counter(TOKENIZER)
+
+        tasks = [
+            (path, records, args.language, args.dpi, args.tessdata)
+            for path, records in queue.items() if os.path.exists(path)
+        ]
+        pages = sum(len(task[1]) for task in tasks)
+        workers = args.workers or os.cpu_count() or 1
+        logging.info(f"OCR: {pages} page(s) in {len(tasks)} PDF(s) with {workers} worker(s)")
+
+        failed = []
+        output = Path(args.output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(tasks) > 1 else None
+        results = pool.map(ocr_file, tasks, chunksize=1) if pool else map(ocr_file, tasks)
+        try:
+            with NdjsonWriter(output) as writer:
+                for path, chunks, error in results:
+                    if error:
+                        failed.append((path, error))
+                        continue
+                    writer.write_many(chunks)
+        finally:
+            if pool:
+                pool.shutdown()
+
+        for path, error in failed:
+            logging.error(f"Failed to OCR {Path(path).name}, Error: {error}")
+            print(f"[❌] {Path(path).name}: {error}")
+
+        logging.info("Script finished successfully: ocr_pages.py")
+        print(f"[✅] OCR complete. {writer.count} chunks from {pages} page(s) → {output}")
+    except Exception as e:
+        logging.error(f"Script failed: ocr_pages.py, Error: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    main()
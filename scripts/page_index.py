@@ -0,0 +1,74 @@
+# scripts/page_index.py
+
+# ----------------------------------------
+# PDF Page Extractability Index
+# ----------------------------------------
+# Written by analyze_pdf_folder.py --index, read by smart_ingest.py.
+# One state character per page:
+#   t = has a text layer (extract as usual)
+#   i = image only, no text (candidate for OCR, see ocr_pages.py)
+#   e = empty (nothing to extract)
+# Entries are keyed by absolute PDF path and trusted only while the
+# file's size and mtime still match, so a stale index falls back to
+# full extraction instead of silently dropping pages.
+# ----------------------------------------
+
+import os
+import json
+from pathlib import Path
+
+PAGE_TEXT = "t"
+PAGE_IMAGE = "i"
+PAGE_EMPTY = "e"
+
+# Bump when the entry layout or page states change
+PAGE_INDEX_VERSION = 1
+
+def index_key(path: Path) -> str:
+    return str(Path(path).resolve())
+
+# Build one entry from a PDF on disk and its page states
+def page_index_entry(path: Path, states: str) -> dict:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime": st.st_mtime_ns, "pages": states}
+
+# ----------------------------------------
+# Merge entries into the index file (atomic temp file + rename)
+# Entries for PDFs that no longer exist are dropped
+# ----------------------------------------
+def write_page_index(index_path: Path, entries: dict) -> int:
+    index_path = Path(index_path)
+    files = {k: v for k, v in _read(index_path).items() if os.path.exists(k)}
+    files.update(entries)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = index_path.with_name(index_path.name + ".tmp")
+    tmp.write_text(json.dumps({"version": PAGE_INDEX_VERSION, "files": files}), encoding="utf-8")
+    os.replace(tmp, index_path)
+    return len(files)
+
+def _read(index_path: Path) -> dict:
+    try:
+        data = json.loads(Path(index_path).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if data.get("version") != PAGE_INDEX_VERSION:
+        return {}
+    return data.get("files", {})
+
+# ----------------------------------------
+# Page states for each of `paths` whose index entry is still fresh
+# Returns {path: "ttie..."}; PDFs without a fresh entry are left out
+# ----------------------------------------
+def load_page_index(index_path: Path, paths: list) -> dict:
+    files = _read(index_path)
+    if not files:
+        return {}
+    states = {}
+    for path in paths:
+        entry = files.get(index_key(path))
+        if not entry:
+            continue
+        st = os.stat(path)
+        if entry["size"] == st.st_size and entry["mtime"] == st.st_mtime_ns:
+            states[path] = entry["pages"]
+    return states
@@ -0,0 +1,131 @@
+# scripts/ragfmt.py
+
+# ----------------------------------------
+# Single CLI entry point for the pipeline
+# ----------------------------------------
+# `ragfmt <command> [args...]` runs one pipeline script in this process;
+# everything after the command goes to that script's own parser, so
+# `ragfmt split --help` lists the split options.
+#
+# `ragfmt run` (ingest → process → check → validate) and `ragfmt post`
+# (the same without ingest) chain the stages in one interpreter; the
+# Makefile's run/post targets call them.
+#
+# A script module (and with it fitz, nltk, requests, numpy, ...) is only
+# imported for the command that needs it, so `ragfmt --help` is instant.
+# ----------------------------------------
+
+import sys
+import argparse
+import importlib
+from pathlib import Path
+
+# Add the project root to sys.path to access config.py
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+# command → (script module, summary)
+COMMANDS = {
+    "crawl": ("ragformatter", "Crawl domains with Apify, download the datasets and run the pipeline"),
+    "precheck": ("analyze_pdf_folder", "Audit PDFs for extractable text (--index writes the page index)"),
+    "normalize": ("normalize_filenames", "Normalize file names in ingestion_source/"),
+    "ingest": ("smart_ingest", "Format-aware ingestion into full/unified.ndjson"),
+    "ocr": ("ocr_pages", "OCR image-only PDF pages queued by ingest"),
+    "clean": ("clean_json_chunks", "Clean unified chunks"),
+    "filter": ("filter_chunks", "Remove boilerplate and duplicate chunks"),
+    "titles": ("inject_titles_from_source", "Inject metadata.title into split files"),
+    "split": ("split_large_json_files", "Split chunks into size-safe domain files"),
+    "split-customgpt": ("split_ready_for_customgpt", "Legacy one-file-per-domain split"),
+    "process": ("run_pipeline", "Clean → filter → title → split in one pass"),
+    "check": ("check_split_file_sizes", "Check split file sizes"),
+    "validate": ("validate_json_output", "Validate the structure of split files"),
+    "bench": ("benchmark_pipeline", "Benchmark pipeline hot paths"),
+}
+
+# Chained commands → summary
+PIPELINES = {
+    "run": "ingest → process → check → validate (make run)",
+    "post": "process → check → validate, skipping ingest (make post)",
+}
+
+def build_parser() -> argparse.ArgumentParser:
+    lines = [f"  {name:<16} {summary}" for name, (_, summary) in COMMANDS.items()]
+    lines += [f"  {name:<16} {summary}" for name, summary in PIPELINES.items()]
+    parser = argparse.ArgumentParser(
+        prog="ragfmt",
+        description="RAG preprocessing pipeline. Run `ragfmt <command> --help` for a command's options.",
+        epilog="commands:\n" + "\n".join(lines),
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("command", choices=[*COMMANDS, *PIPELINES], metavar="command", help="One of the commands below")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments for the command")
+    return parser
+
+# Import a script and call its main() with `argv` as its command line
+def run_script(command: str, argv: list):
+    module = importlib.import_module(COMMANDS[command][0])
+    saved_argv = sys.argv
+    sys.argv = [f"ragfmt {command}", *argv]
+    try:
+        module.main()
+    finally:
+        sys.argv = saved_argv
+
+# ----------------------------------------
+# run / post: the Makefile stages, in-process
+# Options mirror the Makefile variables (WORKERS, SERIALIZE_WORKERS,
+# IO_THREADS, OCR, DEBUG, REPORT); paths come from config.py
+# With --ocr, `run` adds the ocr stage after ingest; `post` reuses an
+# existing full/ocr.ndjson and skips it with a warning if there is none
+# ----------------------------------------
+def pipeline_stages(args, ingest: bool) -> list:
+    from config import FULL_OUTPUT_NDJSON, OCR_OUTPUT_NDJSON, SPLIT_DIR
+
+    split_dir = f"{SPLIT_DIR}/"
+    process = ["--input", str(FULL_OUTPUT_NDJSON), "--output", split_dir,
+               "--serialize-workers", str(args.serialize_workers), "--io-threads", str(args.io_threads)]
+    if args.ocr:
+        # Skipped with a warning when `post --ocr` finds no OCR output yet
+        process += ["--optional-input", str(OCR_OUTPUT_NDJSON)]
+    if args.debug:
+        process.append("--debug-intermediate")
+    validate = ["--input", split_dir] + (["--report", args.report] if args.report else [])
+
+    stages = [("ingest", ["--workers", str(args.workers), "--format", "ndjson"])] if ingest else []
+    if ingest and args.ocr:
+        # OCR the pages this ingest queued, so ocr.ndjson matches unified.ndjson
+        stages.append(("ocr", []))
+    return stages + [("process", process), ("check", ["--input", split_dir]), ("validate", validate)]
+
+def run_pipeline_command(command: str, argv: list):
+    parser = argparse.ArgumentParser(prog=f"ragfmt {command}", description=PIPELINES[command])
+    parser.add_argument("--workers", type=int, default=1, help="Ingest worker processes (0 = all CPU cores)")
+    parser.add_argument("--serialize-workers", type=int, default=0, help="Split stage serialization processes")
+    parser.add_argument("--io-threads", type=int, default=0, help="Split stage part-file writer threads")
+    parser.add_argument("--ocr", action="store_true", help="Include OCR'd pages (full/ocr.ndjson); `run` OCRs the pages ingest queued first")
+    parser.add_argument("--debug", action="store_true", help="Keep intermediate files from the process stage")
+    parser.add_argument("--report", type=str, default=None, help="Write a JSON validation report here")
+    args = parser.parse_args(argv)
+
+    from config import setup_logging
+    setup_logging()
+    import logging
+
+    logging.info(f"Script started: ragfmt.py {command}")
+    try:
+        for stage, stage_argv in pipeline_stages(args, ingest=command == "run"):
+            print(f"[{stage.upper()}] ragfmt {stage} {' '.join(stage_argv)}")
+            run_script(stage, stage_argv)
+        logging.info(f"Script finished successfully: ragfmt.py {command}")
+    except Exception as e:
+        logging.error(f"Script failed: ragfmt.py {command}, Error: {str(e)}")
+        raise
+
+def main(argv: list | None = None):
+    args = build_parser().parse_args(sys.argv[1:] if argv is None else argv)
+    if args.command in PIPELINES:
+        run_pipeline_command(args.command, args.args)
+    else:
+        run_script(args.command, args.args)
+
+if __name__ == "__main__":
+    main()
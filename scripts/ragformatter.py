@@ -1,23 +1,82 @@
+import os
 import sys
 import time
 import json
+import base64
+import asyncio
+import secrets
+import contextlib
+import shutil
 import argparse
-import requests
+import threading
 import subprocess
 from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
 
 # Add the project root to sys.path to access config.py
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 # Import logging setup from config.py
-from config import setup_logging, REPO_ROOT, INGESTION_SOURCE, APIFY_TOKEN
+from config import (
+    setup_logging,
+    settings,
+    APIFY_API_BASE,
+    DATASET_PAGE_SIZE,
+    DATASET_DOWNLOAD_WORKERS,
+    POLL_INITIAL_SECS,
+    POLL_MAX_SECS,
+    POLL_WAIT_SECS,
+    POLL_DEADLINE_SECS,
+    MAX_CONCURRENT_RUNS
+)
 
-# Call the setup function to configure logging
-setup_logging()
-
-# Now you can use logging throughout the script
+# Logging is configured in main(), so importing this module has no side effects
 import logging
 
+from chunk_stream import iter_ndjson, JsonArrayWriter
+
+# Bytes per streamed read while downloading dataset pages
+DOWNLOAD_BLOCK_BYTES = 1 << 20
+
+# (connect, read) timeouts in seconds for Apify API calls
+REQUEST_TIMEOUT = (10, 300)
+
+# Actor run states after which the run will not change again
+TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT"}
+
+# Webhook events Apify fires when a run reaches one of those states
+WEBHOOK_EVENT_TYPES = ["ACTOR.RUN.SUCCEEDED", "ACTOR.RUN.FAILED", "ACTOR.RUN.ABORTED", "ACTOR.RUN.TIMED_OUT"]
+
+# Apify caps waitForFinish at 60 seconds per request
+MAX_WAIT_FOR_FINISH = 60
+
+# One pooled, retrying Session per thread (requests.Session is not thread-safe)
+# requests is imported with the first session, so `--help` and the
+# offline parts of this module do not pay for it
+_local = threading.local()
+
+def get_session() -> "requests.Session":
+    session = getattr(_local, "session", None)
+    if session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        session = requests.Session()
+        # Retry idempotent GETs on throttling / transient server errors
+        retry = Retry(total=5, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset({"GET"}), respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        # Token is resolved (and checked) on first API call, not at import
+        session.headers["Authorization"] = f"Bearer {settings.APIFY_TOKEN}"
+        _local.session = session
+    return session
+
 def build_actor_payload(domain, filters):
     include_globs = [{"glob": f"{domain.rstrip('/')}/{f.strip('/')}**"} for f in filters]
     return {
@@ -67,15 +126,13 @@ def build_actor_payload(domain, filters):
         "renderingTypeDetectionPercentage": 10
     }
 
-def trigger_apify_run(input_payload):
+def trigger_apify_run(input_payload, webhooks=None):
     logging.info("[INFO] Triggering Apify actor run (async)...")
-    url = "https://api.apify.com/v2/acts/apify~website-content-crawler/runs"
-    headers = {
-        "Authorization": f"Bearer {APIFY_TOKEN}",
-        "Content-Type": "application/json"
-    }
+    url = f"{APIFY_API_BASE}/acts/apify~website-content-crawler/runs"
     logging.debug(f"DEBUG - Apify Payload: {json.dumps(input_payload, indent=2)}")
-    res = requests.post(url, json=input_payload, headers=headers)
+    # Ad-hoc webhooks for this run only (base64 JSON, see WebhookReceiver.spec)
+    params = {"webhooks": webhooks} if webhooks else None
+    res = get_session().post(url, json=input_payload, params=params, timeout=REQUEST_TIMEOUT)
 
     if not res.ok:
         logging.error(f"[ERROR] Apify response: {res.text}")
@@ -85,58 +142,376 @@ def trigger_apify_run(input_payload):
     logging.info(f"[INFO] Apify run ID: {run_id}")
     return run_id
 
-def poll_apify(run_id):
-    logging.info("[INFO] Waiting for Apify actor to finish...")
-    url = f"https://api.apify.com/v2/actor-runs/{run_id}"
-    headers = {
-        "Authorization": f"Bearer {APIFY_TOKEN}"
-    }
+# Fetch the current actor run object
+# wait_secs > 0 long-polls: Apify holds the request open until the run
+# finishes or the wait runs out, so a finished run is seen immediately
+def get_run(run_id, wait_secs: float = 0) -> dict:
+    params = {"waitForFinish": int(min(wait_secs, MAX_WAIT_FOR_FINISH))} if wait_secs > 0 else None
+    res = get_session().get(f"{APIFY_API_BASE}/actor-runs/{run_id}", params=params, timeout=REQUEST_TIMEOUT)
+    res.raise_for_status()
+    return res.json()["data"]
+
+# ----------------------------------------
+# Local webhook receiver (--webhook-port)
+# Apify POSTs to `url` when a run ends; the matching waiter wakes up at
+# once instead of on its next poll. The URL carries a random token so
+# stray requests to the port are ignored. Apify must be able to reach
+# the port, e.g. through a tunnel given as --webhook-url.
+# ----------------------------------------
+class WebhookReceiver:
+    def __init__(self, port: int, public_url: str = None, host: str = "0.0.0.0"):
+        self.token = secrets.token_urlsafe(16)
+        base = (public_url or f"http://127.0.0.1:{port}").rstrip("/")
+        self.url = f"{base}/apify-webhook?token={self.token}"
+        self._lock = threading.Lock()
+        self._events = defaultdict(threading.Event)
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    def _handler(self):
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                url = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                if url.path != "/apify-webhook" or parse_qs(url.query).get("token") != [receiver.token]:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.end_headers()
+                try:
+                    payload = json.loads(body or b"{}")
+                except json.JSONDecodeError:
+                    return
+                run_id = (payload.get("resource") or {}).get("id") or (payload.get("eventData") or {}).get("actorRunId")
+                if run_id:
+                    logging.info(f"[INFO] Webhook: run {run_id} {payload.get('eventType', 'finished')}")
+                    receiver.notify(run_id)
+
+            def log_message(self, format, *args):
+                logging.debug(f"[DEBUG] Webhook receiver: {format % args}")
+
+        return Handler
+
+    # Value for the `webhooks` parameter when starting a run
+    def spec(self) -> str:
+        hooks = [{"eventTypes": WEBHOOK_EVENT_TYPES, "requestUrl": self.url}]
+        return base64.b64encode(json.dumps(hooks).encode("utf-8")).decode("ascii")
+
+    def _event(self, run_id) -> threading.Event:
+        with self._lock:
+            return self._events[run_id]
+
+    def notify(self, run_id):
+        self._event(run_id).set()
+
+    # Block until the run's webhook arrives or `timeout` passes; True if it arrived
+    def wait(self, run_id, timeout: float) -> bool:
+        event = self._event(run_id)
+        arrived = event.wait(timeout)
+        event.clear()
+        return arrived
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        logging.info(f"[INFO] Webhook receiver listening on port {self.server.server_address[1]} ({self.url.split('?')[0]})")
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+# ----------------------------------------
+# Wait for a run to reach a terminal state and return the run object
+# - Default: long-poll with waitForFinish, re-issuing the request as soon
+#   as it returns, so completion is seen at once with ~1 request a minute
+# - If the server answers early without holding the request (or
+#   wait_secs=0), back off exponentially from `initial` up to `cap`
+# - With a webhook receiver, sleep until the webhook arrives; every `cap`
+#   seconds one status check covers a lost webhook
+# - Raises TimeoutError after `deadline_secs` (0 = wait forever)
+# ----------------------------------------
+def wait_for_run(run_id, wait_secs: float = POLL_WAIT_SECS, initial: float = POLL_INITIAL_SECS,
+                 cap: float = POLL_MAX_SECS, deadline_secs: float = POLL_DEADLINE_SECS,
+                 receiver: WebhookReceiver = None) -> dict:
+    deadline = time.monotonic() + deadline_secs if deadline_secs else None
+    delay = initial
     while True:
-        res = requests.get(url, headers=headers)
+        remaining = deadline - time.monotonic() if deadline else float("inf")
+        if remaining <= 0:
+            raise TimeoutError(f"Run {run_id} did not finish within {deadline_secs}s")
+
+        if receiver:
+            receiver.wait(run_id, min(cap, remaining))
+            data = get_run(run_id)
+        else:
+            wait = min(wait_secs, remaining, MAX_WAIT_FOR_FINISH)
+            started = time.monotonic()
+            data = get_run(run_id, wait)
+            held = time.monotonic() - started
+
+        if data["status"] in TERMINAL_STATUSES:
+            return data
+        logging.debug(f"[DEBUG] Run {run_id} status: {data['status']}")
+
+        # Returned well before the wait ran out: the server did not hold the request
+        if not receiver and (wait <= 0 or held < wait - 1):
+            time.sleep(min(delay, max(remaining - held, 0)))
+            delay = min(delay * 2, cap)
+
+def poll_apify(run_id, receiver: WebhookReceiver = None, deadline_secs: float = POLL_DEADLINE_SECS):
+    logging.info("[INFO] Waiting for Apify actor to finish...")
+    data = wait_for_run(run_id, deadline_secs=deadline_secs, receiver=receiver)
+    status = data["status"]
+    if status != "SUCCEEDED":
+        logging.error(f"[ERROR] Crawl finished with status: {status}")
+        sys.exit(1)
+    logging.info("[INFO] Crawl finished successfully.")
+    return data["defaultDatasetId"]
+
+# Number of items the dataset reports (may lag slightly behind a just-finished run)
+def dataset_item_count(dataset_id) -> int:
+    res = get_session().get(f"{APIFY_API_BASE}/datasets/{dataset_id}", timeout=REQUEST_TIMEOUT)
+    res.raise_for_status()
+    return res.json()["data"].get("itemCount") or 0
+
+# Count items in a finished JSONL page file
+def count_lines(path: Path) -> int:
+    with open(path, "rb") as f:
+        return sum(block.count(b"\n") for block in iter(lambda: f.read(DOWNLOAD_BLOCK_BYTES), b""))
+
+# ----------------------------------------
+# Stream one page of items (format=jsonl) straight to disk
+# Written to <part>.tmp and renamed when complete, so an existing part
+# file is always a whole page and can be skipped on resume
+# Returns the number of items in the page
+# ----------------------------------------
+def download_page(dataset_id, offset: int, limit: int, part_path: Path) -> int:
+    if part_path.exists():
+        return count_lines(part_path)
+
+    url = f"{APIFY_API_BASE}/datasets/{dataset_id}/items"
+    params = {"format": "jsonl", "offset": offset, "limit": limit}
+    tmp = part_path.with_name(part_path.name + ".tmp")
+    items = 0
+    last = b"\n"
+    with get_session().get(url, params=params, stream=True, timeout=REQUEST_TIMEOUT) as res:
         res.raise_for_status()
-        data = res.json()["data"]
-        status = data["status"]
-        logging.debug(f"[DEBUG] Status: {status}")
-        if status in {"SUCCEEDED", "FAILED", "ABORTED"}:
-            if status != "SUCCEEDED":
-                logging.error(f"[ERROR] Crawl finished with status: {status}")
-                sys.exit(1)
-            logging.info("[INFO] Crawl finished successfully.")
-            return data["defaultDatasetId"]
-        time.sleep(10)
-
-def download_dataset(dataset_id, output_path):
+        with open(tmp, "wb") as f:
+            for block in res.iter_content(DOWNLOAD_BLOCK_BYTES):
+                f.write(block)
+                items += block.count(b"\n")
+                last = block[-1:]
+            if last != b"\n":
+                f.write(b"\n")
+                items += 1
+    os.replace(tmp, part_path)
+    return items
+
+# ----------------------------------------
+# Join page files into the final output
+# .jsonl / .ndjson: raw byte copy; otherwise a JSON array (what ingest expects for .json)
+# ----------------------------------------
+def assemble_parts(part_paths: list, output_path: Path) -> int:
+    tmp = output_path.with_name(output_path.name + ".tmp")
+    if output_path.suffix.lower() in (".jsonl", ".ndjson"):
+        with open(tmp, "wb") as out:
+            for part in part_paths:
+                with open(part, "rb") as f:
+                    shutil.copyfileobj(f, out, DOWNLOAD_BLOCK_BYTES)
+    else:
+        with JsonArrayWriter(tmp) as out:
+            for part in part_paths:
+                out.write_many(iter_ndjson(part))
+    os.replace(tmp, output_path)
+
+# ----------------------------------------
+# Paginated, streamed dataset download
+# - Pages of `page_size` items are fetched `workers` at a time
+# - Each page lands in <output>.parts/ as soon as it finishes; rerunning
+#   with the same dataset and page size resumes from the pages on disk.
+#   Part names carry the page size, so pages cut at another size are
+#   fetched again rather than spliced in at the wrong offsets
+# - Keeps reading past the reported itemCount until a short page,
+#   since the count can trail the items of a just-finished run
+# ----------------------------------------
+def download_dataset(dataset_id, output_path, page_size: int = DATASET_PAGE_SIZE,
+                     workers: int = DATASET_DOWNLOAD_WORKERS):
     logging.info("[INFO] Downloading dataset...")
-    url = f"https://api.apify.com/v2/datasets/{dataset_id}/items?format=json"
-    res = requests.get(url)
-    res.raise_for_status()
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(res.text)
-    logging.info(f"[INFO] Saved crawl results to {output_path}")
+    output_path = Path(output_path)
+    parts_dir = output_path.with_name(output_path.name + ".parts")
+    parts_dir.mkdir(parents=True, exist_ok=True)
+
+    def part_path(offset: int) -> Path:
+        return parts_dir / f"{dataset_id}_p{page_size}_{offset:012d}.jsonl"
+
+    total = dataset_item_count(dataset_id)
+    offsets = list(range(0, max(total, 1), page_size))
+    logging.info(f"[INFO] Dataset {dataset_id}: {total} item(s) in {len(offsets)} page(s) of {page_size}")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        counts = list(pool.map(lambda offset: download_page(dataset_id, offset, page_size, part_path(offset)), offsets))
+
+    # Last page full: the dataset may hold more than itemCount said
+    while counts[-1] == page_size:
+        offsets.append(offsets[-1] + page_size)
+        counts.append(download_page(dataset_id, offsets[-1], page_size, part_path(offsets[-1])))
+
+    assemble_parts([part_path(offset) for offset in offsets], output_path)
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    logging.info(f"[INFO] Saved {sum(counts)} crawl results to {output_path}")
     return output_path
 
 def run_clean_pipeline():
     logging.info("[INFO] Running RAG formatting pipeline...")
-    subprocess.run(["make", "run"], cwd=str(REPO_ROOT))
+    subprocess.run(["make", "run"], cwd=str(settings.REPO_ROOT))
+
+# ingestion_source/<domain>_crawl.json for a root domain URL
+# Kept as .json so a re-crawl replaces the previous file instead of
+# landing next to it under the same doc_id stem
+def crawl_output_path(domain) -> Path:
+    domain_clean = domain.split("//")[-1].strip("/").replace(".", "_")
+    return settings.INGESTION_SOURCE / f"{domain_clean}_crawl.json"
+
+# ----------------------------------------
+# Batch crawling (--batch): many domains in one asyncio event loop
+# Blocking HTTP calls run in worker threads (asyncio.to_thread), each
+# with its own pooled Session, so runs are triggered, polled and
+# downloaded concurrently without an async HTTP dependency.
+# ----------------------------------------
+
+# Parse a batch file: one "<domain> [filter ...]" per line, # comments allowed
+def load_batch_file(path) -> list:
+    entries = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        line = line.split("#", 1)[0].strip()
+        if line:
+            domain, *filters = line.split()
+            entries.append((domain, filters))
+    return entries
+
+# Wait for one run in a worker thread (see wait_for_run)
+async def poll_apify_async(run_id, receiver: WebhookReceiver = None,
+                           deadline_secs: float = POLL_DEADLINE_SECS) -> dict:
+    return await asyncio.to_thread(wait_for_run, run_id, deadline_secs=deadline_secs, receiver=receiver)
+
+# ----------------------------------------
+# Crawl one domain: trigger → poll → download, as its own task
+# `runs` bounds how many actor runs are in flight; the pipeline lock keeps
+# per-dataset pipeline runs (pipeline="each") from overlapping
+# ----------------------------------------
+async def crawl_domain(domain, filters, runs: asyncio.Semaphore, pipeline_lock: asyncio.Lock,
+                       pipeline: str, page_size: int, download_workers: int,
+                       receiver: WebhookReceiver = None, deadline_secs: float = POLL_DEADLINE_SECS) -> Path:
+    async with runs:
+        run_id = await asyncio.to_thread(trigger_apify_run, build_actor_payload(domain, filters),
+                                         receiver.spec() if receiver else None)
+        data = await poll_apify_async(run_id, receiver, deadline_secs)
+    if data["status"] != "SUCCEEDED":
+        raise RuntimeError(f"Crawl of {domain} finished with status: {data['status']}")
+
+    logging.info(f"[INFO] Crawl of {domain} finished; downloading dataset {data['defaultDatasetId']}")
+    output_path = await asyncio.to_thread(download_dataset, data["defaultDatasetId"], crawl_output_path(domain),
+                                          page_size, download_workers)
+    if pipeline == "each":
+        # Ingest is incremental, so each run only parses the new dataset
+        async with pipeline_lock:
+            await asyncio.to_thread(run_clean_pipeline)
+    return output_path
+
+# Run every domain concurrently; returns {domain: output path or exception}
+async def crawl_batch(entries: list, max_runs: int = MAX_CONCURRENT_RUNS, pipeline: str = "end",
+                      page_size: int = DATASET_PAGE_SIZE, download_workers: int = DATASET_DOWNLOAD_WORKERS,
+                      receiver: WebhookReceiver = None, deadline_secs: float = POLL_DEADLINE_SECS) -> dict:
+    # Each in-flight run holds a thread in a long-poll, so size the default
+    # executor for them plus the threads that trigger runs and download datasets
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=2 * max_runs + 4))
+    runs = asyncio.Semaphore(max_runs)
+    pipeline_lock = asyncio.Lock()
+    results = await asyncio.gather(
+        *(crawl_domain(domain, filters, runs, pipeline_lock, pipeline, page_size, download_workers,
+                       receiver, deadline_secs)
+          for domain, filters in entries),
+        return_exceptions=True
+    )
+    return {domain: result for (domain, _), result in zip(entries, results)}
+
+def run_batch(args, receiver: WebhookReceiver = None) -> int:
+    entries = load_batch_file(args.batch)
+    logging.info(f"[INFO] Batch crawl of {len(entries)} domain(s), up to {args.max_runs} run(s) at once")
+    results = asyncio.run(crawl_batch(entries, args.max_runs, args.pipeline, args.page_size, args.download_workers,
+                                      receiver, args.deadline))
+
+    failed = {domain: r for domain, r in results.items() if isinstance(r, BaseException)}
+    for domain, error in failed.items():
+        logging.error(f"[ERROR] {domain}: {error}")
+        print(f"[❌] {domain}: {error}")
+
+    if args.pipeline == "end" and len(failed) < len(results):
+        run_clean_pipeline()
+    print(f"[✅] Batch done. {len(results) - len(failed)} of {len(results)} domain(s) downloaded.")
+    return len(failed)
 
 def main():
+    parser = argparse.ArgumentParser(
+        description="Crawl a domain and restrict by path filters"
+    )
+    parser.add_argument("domain", nargs="?", help="Root domain (e.g., https://docs.pinecone.io/)")
+    parser.add_argument("filters", nargs="*", help="Optional subpaths (e.g., guides, setup)")
+    parser.add_argument("--dataset-id", type=str, default=None,
+                        help="Skip the crawl and (re)download an existing dataset; resumes a partial download")
+    parser.add_argument("--page-size", type=int, default=DATASET_PAGE_SIZE, help="Items per dataset page request")
+    parser.add_argument("--download-workers", type=int, default=DATASET_DOWNLOAD_WORKERS,
+                        help="Dataset pages fetched in parallel")
+    parser.add_argument("--batch", type=str, default=None,
+                        help="File with one '<domain> [filter ...]' per line; crawls all domains concurrently")
+    parser.add_argument("--max-runs", type=int, default=MAX_CONCURRENT_RUNS,
+                        help="Actor runs in flight at once in --batch mode")
+    parser.add_argument("--pipeline", choices=["end", "each", "none"], default="end",
+                        help="--batch: run the pipeline once at the end, after each dataset, or not at all")
+    parser.add_argument("--deadline", type=float, default=POLL_DEADLINE_SECS,
+                        help="Give up on a run after this many seconds (0 = no limit)")
+    parser.add_argument("--webhook-port", type=int, default=None,
+                        help="Listen on this port for Apify run-finished webhooks instead of long-polling")
+    parser.add_argument("--webhook-url", type=str, default=None,
+                        help="Public URL that forwards to --webhook-port (e.g. a tunnel); "
+                             "defaults to http://127.0.0.1:<port>")
+    args = parser.parse_args()
+    if not args.batch and not args.domain:
+        parser.error("domain is required unless --batch is given")
+
+    setup_logging()
     logging.info("Script started: ragformatter.py")
     try:
-        parser = argparse.ArgumentParser(
-            description="Crawl a domain and restrict by path filters"
-        )
-        parser.add_argument("domain", help="Root domain (e.g., https://docs.pinecone.io/)")
-        parser.add_argument("filters", nargs="*", help="Optional subpaths (e.g., guides, setup)")
-        args = parser.parse_args()
-
-        payload = build_actor_payload(args.domain, args.filters)
-        run_id = trigger_apify_run(payload)
-        dataset_id = poll_apify(run_id)
-
-        domain_clean = args.domain.split("//")[-1].strip("/").replace(".", "_")
-        filename = f"{domain_clean}_crawl.json"
-        output_path = INGESTION_SOURCE / filename
-        download_dataset(dataset_id, output_path)
+        settings.require("crawl")
+
+        with contextlib.ExitStack() as stack:
+            receiver = None
+            if args.webhook_port is not None and not args.dataset_id:
+                receiver = stack.enter_context(WebhookReceiver(args.webhook_port, args.webhook_url))
+
+            if args.batch:
+                failed = run_batch(args, receiver)
+                logging.info("Script finished successfully: ragformatter.py")
+                if failed:
+                    sys.exit(1)
+                return
+
+            dataset_id = args.dataset_id
+            if not dataset_id:
+                payload = build_actor_payload(args.domain, args.filters)
+                run_id = trigger_apify_run(payload, receiver.spec() if receiver else None)
+                dataset_id = poll_apify(run_id, receiver, args.deadline)
+
+        # Pages stream to disk as JSONL, then are joined into one JSON array
+        output_path = crawl_output_path(args.domain)
+        filename = output_path.name
+        download_dataset(dataset_id, output_path, args.page_size, args.download_workers)
 
         run_clean_pipeline()
         logging.info("Script finished successfully: ragformatter.py")
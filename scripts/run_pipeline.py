@@ -0,0 +1,143 @@
+# scripts/run_pipeline.py
+
+# ----------------------------------------
+# Fused Post-Ingest Pipeline
+# ----------------------------------------
+# Runs clean → filter → title → split in a single process over one
+# read of the unified chunk stream (NDJSON or JSON array).
+# Several inputs (e.g. unified.ndjson + ocr.ndjson) are read in order.
+# - Each stage is a generator; chunks flow through one at a time
+# - Intermediate files (unified-clean.json, filtered.json) are only
+#   written when --debug-intermediate is passed
+# Output: split/{domain}.json or split/{domain}_partN.json
+# ----------------------------------------
+
+import sys
+import argparse
+from itertools import chain
+from pathlib import Path
+
+# Import logging setup from config.py
+from config import setup_logging
+
+# Logging is configured in main(), so importing this module has no side effects
+import logging
+
+# Import config paths
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from config import settings, FULL_OUTPUT_NDJSON, CLEAN_FULL_OUTPUT_FILE, SPLIT_DIR, TOKENIZER
+from chunk_stream import iter_chunks, open_chunk_writer
+from clean_json_chunks import clean_chunk
+from filter_chunks import is_junk, get_junk_matcher, add_dedup_args, build_deduplicator
+from split_large_json_files import write_chunk_stream, add_split_args
+from inject_titles_from_source import title_stage
+
+# ----------------------------------------
+# Stage: clean each chunk, dropping blanks and short content
+# ----------------------------------------
+def clean_stage(chunks, stats: dict):
+    for chunk in chunks:
+        stats["read"] += 1
+        cleaned = clean_chunk(chunk)
+        if cleaned:
+            stats["cleaned"] += 1
+            yield cleaned
+
+# ----------------------------------------
+# Stage: drop empty, boilerplate or duplicate chunks
+# ----------------------------------------
+def filter_stage(chunks, stats: dict, dedup=None):
+    for chunk in chunks:
+        content = chunk.get("content", "")
+        if not content or is_junk(content):
+            continue
+        if dedup and dedup.check(content):
+            continue
+        stats["kept"] += 1
+        yield chunk
+
+# ----------------------------------------
+# Stage: pass chunks through while copying them to a debug file
+# ----------------------------------------
+def tee_stage(chunks, path: Path):
+    with open_chunk_writer(path) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+            yield chunk
+    logging.info(f"Wrote intermediate {writer.count} chunks → {path}")
+
+# ----------------------------------------
+# Chain the stages over a single read of input_path (a path or list of paths)
+# ----------------------------------------
+def run_pipeline(input_path: Path | list, output_dir: Path, debug: bool = False, dedup=None,
+                 serialize_workers: int = 0, io_threads: int = 0, titles: bool = True,
+                 tokenizer: str | None = TOKENIZER) -> dict:
+    stats = {"read": 0, "cleaned": 0, "kept": 0, "titled": 0}
+
+    paths = input_path if isinstance(input_path, (list, tuple)) else [input_path]
+    stream = clean_stage(chain.from_iterable(iter_chunks(Path(p)) for p in paths), stats)
+    if debug:
+        stream = tee_stage(stream, CLEAN_FULL_OUTPUT_FILE)
+
+    stream = filter_stage(stream, stats, dedup)
+    if debug:
+        stream = tee_stage(stream, CLEAN_FULL_OUTPUT_FILE.parent / "filtered.json")
+
+    # Fill missing titles before split so split/ is written exactly once
+    if titles:
+        stream = title_stage(stream, stats)
+
+    written = write_chunk_stream(stream, output_dir, serialize_workers=serialize_workers,
+                                 io_threads=io_threads, tokenizer=tokenizer)
+    stats["domains"] = len(written)
+    if dedup:
+        stats["exact_duplicates"] = dedup.stats["exact"]
+        stats["near_duplicates"] = dedup.stats["near"]
+    return stats
+
+# ----------------------------------------
+# CLI entrypoint
+# ----------------------------------------
+def main():
+    parser = argparse.ArgumentParser(description="Clean, filter and split chunks in a single pass.")
+    parser.add_argument("--input", type=str, nargs="+", default=[FULL_OUTPUT_NDJSON],
+                        help="Path(s) to unified.ndjson / unified.json")
+    parser.add_argument("--optional-input", type=str, nargs="*", default=[],
+                        help="Extra input(s) read after --input if they exist (e.g. full/ocr.ndjson)")
+    parser.add_argument("--output", type=str, default=SPLIT_DIR, help="Output directory for split files")
+    parser.add_argument("--debug-intermediate", action="store_true",
+                        help="Also write unified-clean.json and filtered.json for inspection")
+    parser.add_argument("--no-titles", action="store_true", help="Skip in-stream metadata.title inference")
+    add_dedup_args(parser)
+    add_split_args(parser)
+    args = parser.parse_args()
+
+    setup_logging()
+    logging.info("Script started: run_pipeline.py")
+    try:
+        settings.require("process")
+
+        inputs = [Path(p) for p in args.input]
+        for path in map(Path, args.optional_input):
+            if path.exists():
+                inputs.append(path)
+            else:
+                logging.warning(f"Optional input {path} not found, skipping it")
+                print(f"[⚠️] {path} not found, skipping it")
+
+        stats = run_pipeline(inputs, Path(args.output), debug=args.debug_intermediate,
+                             dedup=build_deduplicator(args), serialize_workers=args.serialize_workers,
+                             io_threads=args.io_threads, titles=not args.no_titles,
+                             tokenizer=None if args.no_token_counts else TOKENIZER)
+
+        get_junk_matcher().report()
+        logging.info(f"Pipeline stats: {stats}")
+        logging.info("Script finished successfully: run_pipeline.py")
+        print(f"[✅] {stats['read']} read → {stats['cleaned']} cleaned → {stats['kept']} kept → "
+              f"{stats['domains']} domain file(s) in {args.output}")
+    except Exception as e:
+        logging.error(f"Script failed: run_pipeline.py, Error: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    main()
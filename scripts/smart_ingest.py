@@ -3,43 +3,51 @@
 # ----------------------------------------
 # Format-Aware Ingestion Pipeline
 # ----------------------------------------
-# Ingests mixed file types (.pdf, .md, .json, .html, .epub)
+# Ingests mixed file types (.pdf, .md, .json/.jsonl, .html, .epub)
 # Normalizes, chunks, and standardizes output structure
-# Final result written to FULL_OUTPUT_FILE (e.g. full/unified.json)
+# Each file's chunks are cached as soon as it finishes; only new or
+# changed files are re-parsed on later runs (see ingest_manifest.py).
+# FULL_OUTPUT_NDJSON (full/unified.ndjson) is rebuilt from the cache and
+# FULL_OUTPUT_FILE (full/unified.json) is produced from it on request
+# PDF pages marked empty or image-only in the precheck page index are
+# skipped; image-only pages are listed in full/ocr_queue.ndjson for
+# optional OCR (ocr_pages.py)
 # ----------------------------------------
 
-import json
-import fitz  # PyMuPDF for PDF parsing
 import re
-import html
-import nltk
 import sys
 import os
+import argparse
+from bisect import bisect_left
 from pathlib import Path
-from nltk.tokenize import sent_tokenize
+from concurrent.futures import ProcessPoolExecutor
 
 # Import logging setup from config.py
 from config import setup_logging
 
-# Call the setup function to configure logging
-setup_logging()
-
-# Now you can use logging throughout the script
+# Logging is configured in main(), so importing this module has no side effects
 import logging
 
-# Ensure sentence tokenizer is downloaded
-nltk.download('punkt', quiet=True)
-
 # ----------------------------------------
 # Load config from project root
 # ----------------------------------------
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 from config import (
-    INGESTION_SOURCE,
+    settings,
     FULL_OUTPUT_FILE,
+    FULL_OUTPUT_NDJSON,
+    INGEST_CACHE_DIR,
+    PDF_PAGE_INDEX,
+    OCR_QUEUE_FILE,
     TARGET_TOKENS,
-    OVERLAP_TOKENS
+    OVERLAP_TOKENS,
+    TOKENIZER
 )
+from chunk_stream import ndjson_to_json_array, NdjsonWriter, iter_chunks
+from page_index import PAGE_TEXT, PAGE_IMAGE, load_page_index
+from ingest_manifest import IngestManifest
+from token_counter import get_token_counter, require_token_counter
+from text_normalize import clean_raw_text, strip_tags
 
 # ----------------------------------------
 # Utility: Normalize filenames into safe doc_ids
@@ -52,76 +60,176 @@ def normalize_filename(name: str) -> str:
     return re.sub(r"[^a-z0-9]+", "_", name).strip("_")
 
 # ----------------------------------------
-# Utility: Normalize and clean text
+# Utility: Normalize and clean text (shared with the clean stage)
+# ----------------------------------------
+clean_text = clean_raw_text
+
+# ----------------------------------------
+# Sentence windows over per-sentence token counts
+# Yields (start, end) index ranges. A prefix sum of counts turns both the
+# "window full" test and the overlap backtrack into index arithmetic:
+# the overlap start is the first j with prefix[end] - prefix[j] <= overlap.
+# ----------------------------------------
+def sentence_windows(counts: list, target_tokens: int, overlap_tokens: int):
+    prefix = [0]
+    for c in counts:
+        prefix.append(prefix[-1] + c)
+
+    start = 0
+    for i in range(len(counts)):
+        if prefix[i + 1] - prefix[start] > target_tokens and i > start:
+            yield start, i
+            start = bisect_left(prefix, prefix[i] - overlap_tokens, start, i)
+
+    if start < len(counts):
+        yield start, len(counts)
+
+# ----------------------------------------
+# Sentence splitting (NLTK punkt)
+# nltk is imported on first use, and punkt is only downloaded when it is
+# not installed yet; the check runs once per process, not on every start
 # ----------------------------------------
-def clean_text(text: str) -> str:
-    text = html.unescape(text)
-    text = text.replace('\u00ad', '').replace('\xa0', ' ').replace('\n', ' ')
-    return re.sub(r'\s+', ' ', text).strip()
+_punkt_ready = False
+
+def ensure_punkt():
+    global _punkt_ready
+    if not _punkt_ready:
+        import nltk
+        try:
+            nltk.data.find("tokenizers/punkt")
+        except LookupError:
+            # nltk.download returns False (it does not raise) when offline
+            nltk.download("punkt", quiet=True)
+            try:
+                nltk.data.find("tokenizers/punkt")
+            except LookupError as e:
+                raise RuntimeError(
+                    "NLTK punkt tokenizer is not installed and could not be downloaded. "
+                    "Install it with network access (python -m nltk.downloader punkt), or copy "
+                    "tokenizers/punkt into a folder listed in NLTK_DATA on this machine"
+                ) from e
+        _punkt_ready = True
+
+def sent_tokenize(text: str) -> list:
+    ensure_punkt()
+    from nltk.tokenize import sent_tokenize as punkt_sent_tokenize
+    return punkt_sent_tokenize(text)
 
 # ----------------------------------------
 # Sentence window chunking with token overlap
 # ----------------------------------------
-def chunk_sentences(text: str, target_tokens: int, overlap_tokens: int, meta: dict) -> list:
+def chunk_sentences(text: str, target_tokens: int, overlap_tokens: int, meta: dict, counter=None) -> list:
+    counter = counter or get_token_counter(TOKENIZER)
     sentences = sent_tokenize(text)
-    chunks = []
-    current_chunk = []
-    current_tokens = 0
+    # Encode every sentence once per page; windows reuse these counts
+    counts = counter.count_many(sentences)
 
-    for sentence in sentences:
-        tokens = len(sentence.split())
-        if current_tokens + tokens > target_tokens:
-            chunks.append({
-                "source": meta["source_path"],
-                "content": ' '.join(current_chunk),
-                "metadata": meta
-            })
-            # Backtrack for overlap
-            overlap = []
-            total = 0
-            for sent in reversed(current_chunk):
-                stokens = len(sent.split())
-                if total + stokens <= overlap_tokens:
-                    overlap.insert(0, sent)
-                    total += stokens
-                else:
-                    break
-            current_chunk = overlap.copy()
-            current_tokens = total
-        current_chunk.append(sentence)
-        current_tokens += tokens
-
-    if current_chunk:
-        chunks.append({
+    return [
+        {
             "source": meta["source_path"],
-            "content": ' '.join(current_chunk),
+            "content": ' '.join(sentences[start:end]),
             "metadata": meta
-        })
+        }
+        for start, end in sentence_windows(counts, target_tokens, overlap_tokens)
+    ]
 
-    return chunks
+# ----------------------------------------
+# Markdown block patterns (ATX headings and code fences)
+# ----------------------------------------
+MD_HEADING = re.compile(r"^ {0,3}(#{1,6})[ \t]+(.*?)[ \t#]*$")
+MD_FENCE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
 
 # ----------------------------------------
-# Paragraph window chunking for Markdown files
+# Split markdown into sections in one pass over its lines
+# Yields (heading_path, blocks); blocks are paragraphs, headings or whole
+# fenced code blocks. A fence is never split, even across blank lines.
 # ----------------------------------------
-def chunk_markdown(text: str, window_size: int, overlap: int, meta: dict) -> list:
-    paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
-    chunks = []
+def markdown_sections(text: str):
+    path = []          # [(level, title), ...] for the current section
+    blocks = []
+    para = []
+    fence = None       # opening fence marker while inside a code block
+    has_body = False   # section has more than bare headings
+
+    def end_para():
+        nonlocal has_body
+        if para:
+            blocks.append("\n".join(para).strip())
+            para.clear()
+            has_body = True
+
+    for line in text.splitlines():
+        if fence:
+            para.append(line)
+            stripped = line.strip()
+            if stripped.startswith(fence[0] * len(fence)) and not stripped.strip(fence[0]):
+                fence = None
+                end_para()
+            continue
+
+        m = MD_FENCE.match(line)
+        if m:
+            end_para()
+            fence = m.group(1)
+            para.append(line)
+            continue
+
+        m = MD_HEADING.match(line)
+        if m:
+            end_para()
+            # Headings with no body yet stay attached to the next section
+            if has_body:
+                yield [title for _, title in path], blocks
+                blocks = []
+                has_body = False
+            level = len(m.group(1))
+            while path and path[-1][0] >= level:
+                path.pop()
+            path.append((level, m.group(2)))
+            blocks.append(line.strip())
+            continue
+
+        if line.strip():
+            para.append(line)
+        else:
+            end_para()
+
+    end_para()
+    if blocks:
+        yield [title for _, title in path], blocks
 
-    if len(paragraphs) < window_size:
-        chunks.append({
-            "source": meta["source_path"],
-            "content": "\n\n".join(paragraphs),
-            "metadata": meta
-        })
-        return chunks
+# ----------------------------------------
+# Heading-aware markdown chunking packed by token budget
+# - Sections never share a chunk; heading path goes into metadata
+# - Blocks are packed with sentence_windows (overlap within a section)
+# - Oversized prose paragraphs fall back to sentence units
+# ----------------------------------------
+def chunk_markdown(text: str, target_tokens: int, overlap_tokens: int, meta: dict, counter=None) -> list:
+    counter = counter or get_token_counter(TOKENIZER)
+    chunks = []
 
-    for i in range(0, len(paragraphs) - window_size + 1, max(1, window_size - overlap)):
-        window = paragraphs[i:i + window_size]
-        chunks.append({
-            "source": meta["source_path"],
-            "content": "\n\n".join(window),
-            "metadata": meta
-        })
+    for heading_path, blocks in markdown_sections(text):
+        # Units are (separator, text) so split paragraphs re-join with spaces
+        units = []
+        unit_counts = []
+        for block, count in zip(blocks, counter.count_many(blocks)):
+            if count > target_tokens and not MD_FENCE.match(block):
+                sentences = sent_tokenize(block)
+                units.extend(("\n\n" if i == 0 else " ", sent) for i, sent in enumerate(sentences))
+                unit_counts.extend(counter.count_many(sentences))
+            else:
+                units.append(("\n\n", block))
+                unit_counts.append(count)
+
+        section_meta = dict(meta, heading_path=heading_path)
+
+        for start, end in sentence_windows(unit_counts, target_tokens, overlap_tokens):
+            window = units[start:end]
+            chunks.append({
+                "source": meta["source_path"],
+                "content": window[0][1] + "".join(sep + unit for sep, unit in window[1:]),
+                "metadata": section_meta
+            })
 
     return chunks
 
@@ -151,25 +259,39 @@ def normalize_json_entry(entry: dict, i: int, doc_id: str) -> dict:
     }
 
 
+# ----------------------------------------
+# Metadata for one PDF page (shared with the OCR queue)
+# ----------------------------------------
+def pdf_page_meta(path: Path, page_number: int) -> dict:
+    doc_id = normalize_filename(path.stem)
+    return {
+        "doc_id": doc_id,
+        "page_number": page_number,
+        "source_file": doc_id,
+        "source_path": f"{settings.INGESTION_SOURCE.name}/{doc_id}"
+    }
+
 # ----------------------------------------
 # Format-aware dispatch per file type
+# page_states: precheck index string for a PDF (one char per page);
+# only text pages are extracted when it is given
 # ----------------------------------------
-def process_file(path: Path) -> list:
+def process_file(path: Path, page_states: str | None = None) -> list:
     ext = path.suffix.lower()
     doc_id = normalize_filename(path.stem)
-    source_path = f"{INGESTION_SOURCE.name}/{doc_id}"
+    source_path = f"{settings.INGESTION_SOURCE.name}/{doc_id}"
     chunks = []
 
     if ext == ".pdf":
+        import fitz  # PyMuPDF for PDF parsing
         doc = fitz.open(path)
+        if page_states is not None and len(page_states) != len(doc):
+            page_states = None  # Index does not describe this file; extract everything
         for i, page in enumerate(doc):
+            if page_states and page_states[i] != PAGE_TEXT:
+                continue
             text = clean_text(page.get_text())
-            meta = {
-                "doc_id": doc_id,
-                "page_number": i + 1,
-                "source_file": doc_id,
-                "source_path": source_path
-            }
+            meta = pdf_page_meta(path, i + 1)
             chunks.extend(chunk_sentences(text, TARGET_TOKENS, OVERLAP_TOKENS, meta))
 
     elif ext == ".md":
@@ -181,16 +303,16 @@ def process_file(path: Path) -> list:
         }
         chunks.extend(chunk_markdown(text, TARGET_TOKENS, OVERLAP_TOKENS, meta))
 
-    elif ext == ".json":
-        data = json.loads(path.read_text(encoding="utf-8"))
-        for i, entry in enumerate(data):
+    elif ext in (".json", ".jsonl"):
+        # Crawl dumps: JSON array or JSONL (streamed either way)
+        for i, entry in enumerate(iter_chunks(path)):
             chunk = normalize_json_entry(entry, i, doc_id)
             if chunk["content"]:
                 chunks.append(chunk)
 
     elif ext == ".html":
         raw = path.read_text(encoding="utf-8")
-        text = clean_text(re.sub(r"<[^>]+>", "", raw))  # simple tag strip
+        text = clean_text(strip_tags(raw))  # simple tag strip
         meta = {
             "doc_id": doc_id,
             "source_file": doc_id,
@@ -216,23 +338,139 @@ def process_file(path: Path) -> list:
 
     return chunks
 
+# ----------------------------------------
+# Supported input extensions (dispatched by process_file)
+# ----------------------------------------
+SUPPORTED_EXTENSIONS = {".pdf", ".md", ".json", ".jsonl", ".html", ".epub"}
+
+# ----------------------------------------
+# Collect ingestable files in a stable order
+# Sorted so serial and parallel runs emit chunks identically
+# ----------------------------------------
+def collect_source_files(root: Path) -> list:
+    return sorted(
+        path for path in root.rglob("*")
+        if path.is_file() and path.suffix.lower() in SUPPORTED_EXTENSIONS
+    )
+
+# ----------------------------------------
+# Worker wrapper: never raises, returns (path, chunks, error)
+# Keeps one bad file from aborting the whole run
+# ----------------------------------------
+def process_file_safe(path: Path, page_states: str | None = None) -> tuple:
+    try:
+        return path, process_file(path, page_states), None
+    except Exception as e:
+        return path, [], f"{type(e).__name__}: {e}"
+
+# ----------------------------------------
+# Yield per-file results in input order
+# workers <= 1 runs in-process; otherwise fans out to a process pool
+# page_index: {pdf path: page states} from load_page_index
+# ----------------------------------------
+def iter_processed(paths: list, workers: int = 1, page_index: dict | None = None):
+    page_index = page_index or {}
+    states = [page_index.get(path) for path in paths]
+    if workers <= 1:
+        for path, page_states in zip(paths, states):
+            yield process_file_safe(path, page_states)
+        return
+
+    # PyMuPDF / BeautifulSoup are CPU-bound and hold the GIL, so use processes.
+    # Executor.map preserves input order; chunksize=1 keeps large PDFs from
+    # being batched behind each other on a single worker.
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(process_file_safe, paths, states, chunksize=1)
+
+# ----------------------------------------
+# List every image-only page of the indexed PDFs for OCR
+# Rebuilt each run so cached (unchanged) PDFs stay queued too
+# ----------------------------------------
+def write_ocr_queue(page_index: dict, output_path: Path) -> int:
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with NdjsonWriter(output_path) as writer:
+        for path, page_states in page_index.items():
+            for i, state in enumerate(page_states):
+                if state == PAGE_IMAGE:
+                    writer.write({"path": str(path), "page_number": i + 1, "metadata": pdf_page_meta(path, i + 1)})
+    return writer.count
+
 # ----------------------------------------
 # Entry Point: Walk folder → process → save output
 # ----------------------------------------
 def main():
+    parser = argparse.ArgumentParser(description="Format-aware ingestion of mixed documents.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes (default: 1 = serial; 0 = all CPU cores)")
+    parser.add_argument("--format", choices=["ndjson", "both"], default="both",
+                        help="ndjson: only write unified.ndjson; both: also write the unified.json array")
+    parser.add_argument("--full", action="store_true",
+                        help="Ignore the ingest cache and re-parse every file")
+    args = parser.parse_args()
+
+    setup_logging()
     logging.info("Script started: smart_ingest.py")
     try:
-        all_chunks = []
-
-        for path in INGESTION_SOURCE.rglob("*"):
-            if path.suffix.lower() in [".pdf", ".md", ".json", ".html", ".epub"]:
-                all_chunks.extend(process_file(path))
-
-        with open(FULL_OUTPUT_FILE, "w", encoding="utf-8") as f:
-            json.dump(all_chunks, f, indent=2, ensure_ascii=False)
+        settings.require("ingest")
+
+        workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+        paths = collect_source_files(settings.INGESTION_SOURCE)
+        # Fetch punkt and load the token counter here, rather than in every worker,
+        # so a missing resource stops the run instead of skipping each file
+        ensure_punkt()
+        require_token_counter(TOKENIZER)
+
+        manifest = IngestManifest(INGEST_CACHE_DIR, settings.INGESTION_SOURCE, {
+            "target_tokens": TARGET_TOKENS,
+            "overlap_tokens": OVERLAP_TOKENS,
+            "tokenizer": TOKENIZER
+        })
+        if args.full:
+            manifest.entries = {}
+
+        removed = manifest.prune(paths)
+        pending = [path for path in paths if not manifest.is_current(path)]
+        logging.info(f"Ingesting {len(pending)} new/changed of {len(paths)} file(s) "
+                     f"with {workers} worker(s); {len(removed)} removed")
+
+        # Precheck page index (analyze_pdf_folder.py --index): skip non-text pages
+        page_index = load_page_index(PDF_PAGE_INDEX, [path for path in paths if path.suffix.lower() == ".pdf"])
+        if page_index:
+            skipped = sum(len(page_index[p]) - page_index[p].count(PAGE_TEXT) for p in pending if p in page_index)
+            logging.info(f"Page index covers {len(page_index)} PDF(s); skipping {skipped} non-text page(s)")
+        queued = write_ocr_queue(page_index, OCR_QUEUE_FILE)
+        if queued:
+            logging.info(f"Queued {queued} image-only page(s) for OCR → {OCR_QUEUE_FILE}")
+
+        failed = []
+
+        # Each file's chunks go to its cache entry as soon as it finishes,
+        # so memory stays flat and a crash keeps everything parsed so far
+        for done, (path, chunks, error) in enumerate(iter_processed(pending, workers, page_index), 1):
+            if error:
+                logging.error(f"Failed to ingest {path.name}, Error: {error}")
+                print(f"[❌] {path.name}: {error}")
+                manifest.forget(manifest.key(path))
+                failed.append(path.name)
+                continue
+            manifest.store(path, chunks)
+            if done % 50 == 0:
+                manifest.save()
+
+        manifest.save()
+        total = manifest.write_unified(paths, FULL_OUTPUT_NDJSON)
+
+        if failed:
+            logging.warning(f"{len(failed)} file(s) failed during ingestion: {', '.join(failed)}")
+
+        output = FULL_OUTPUT_NDJSON
+        if args.format == "both":
+            # Compatibility path: stream NDJSON lines into a JSON array
+            ndjson_to_json_array(FULL_OUTPUT_NDJSON, FULL_OUTPUT_FILE)
+            output = FULL_OUTPUT_FILE
 
         logging.info("Script finished successfully: smart_ingest.py")
-        print(f"[✅] Ingestion complete. {len(all_chunks)} chunks → {FULL_OUTPUT_FILE}")
+        print(f"[✅] Ingestion complete. {total} chunks → {output}")
     except Exception as e:
         logging.error(f"Script failed: smart_ingest.py, Error: {str(e)}")
         raise
@@ -3,34 +3,50 @@
 # ----------------------------------------
 # Large File Splitter for TypingMind/LLM Constraints
 # ----------------------------------------
-# Splits large output files into smaller parts, each under ~50MB character limit
+# Splits large output files into smaller parts, each under a ~50MB byte limit
+# Each chunk is serialized once; parts are packed by exact on-disk size
+# Optional process-pool serialization + threaded, atomic part writes
+# Writes split/.split_manifest with per-file bytes, chunks, chars, tokens, sha256
 # Output format: domain.json, or domain_part1.json, etc.
 # ----------------------------------------
 
-import json
 import os
 import argparse
 import sys
-import re
+import zlib
+import hashlib
 from urllib.parse import urlparse
 from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 # Import logging setup from config.py
 from config import setup_logging
 
-# Call the setup function to configure logging
-setup_logging()
-
-# Now you can use logging throughout the script
+# Logging is configured in main(), so importing this module has no side effects
 import logging
 
 # Import config paths
 sys.path.append(str(Path(__file__).resolve().parents[1]))
-from config import CLEAN_FULL_OUTPUT_FILE, SPLIT_DIR
+from config import settings, CLEAN_FULL_OUTPUT_FILE, SPLIT_DIR, TOKENIZER
+from chunk_stream import iter_chunks, dumps_array_item
+from split_manifest import manifest_entry, write_split_manifest
+from token_counter import get_token_counter
+
+# Max size in bytes per JSON file (~50MB for TypingMind etc.)
+# Budgeted against the exact UTF-8 bytes written, so parts never exceed it
+MAX_BYTES_PER_FILE = 50_000_000
+
+# Fixed framing of a part file: "[" + "\n" item + (",\n" item)* + "\n]"
+ARRAY_OPEN = b"["
+ARRAY_CLOSE = b"\n]"
+FIRST_SEP = b"\n"
+NEXT_SEP = b",\n"
 
-# Max size in characters per JSON file (~50MB for TypingMind etc.)
-MAX_CHARS_PER_FILE = 50_000_000
+# Bytes buffered per part before a write is issued, and chunks per
+# serialization batch sent to worker processes
+WRITE_BUFFER_BYTES = 1 << 20
+ENCODE_BATCH_SIZE = 2000
 
 # ----------------------------------------
 # Normalize domain into safe slug for filename
@@ -39,41 +55,364 @@ def domain_slug(url):
     hostname = urlparse(url).hostname or "unknown"
     return hostname.replace(".", "-")
 
+# Domain slug for a single chunk ("unknown" if it has no URL)
+def chunk_domain(chunk: dict) -> str:
+    url = (chunk.get("metadata") or {}).get("url") or chunk.get("url")
+    return domain_slug(url) if url else "unknown"
+
 # Group all chunks under a single domain
 def chunk_by_domain(chunks: list) -> dict:
     grouped = defaultdict(list)
     for chunk in chunks:
-        url = chunk.get("metadata", {}).get("url") or chunk.get("url")
-        domain = domain_slug(url) if url else "unknown"
-        grouped[domain].append(chunk)
+        grouped[chunk_domain(chunk)].append(chunk)
     return grouped
 
-# Divide large chunk lists into multiple files under the char limit
-def split_large_file(chunks: list, max_chars: int) -> list:
+# Serialize a chunk exactly once, as the bytes that land in the part file
+def encode_chunk(chunk: dict) -> bytes:
+    return dumps_array_item(chunk).encode("utf-8")
+
+# Final file size if `item` were appended to a part of `count` items / `written` bytes
+def projected_size(written: int, count: int, item: bytes) -> int:
+    return written + len(FIRST_SEP if count == 0 else NEXT_SEP) + len(item) + len(ARRAY_CLOSE)
+
+# Divide encoded chunks into parts whose files stay under the byte limit
+def split_large_file(items: list, max_bytes: int) -> list:
     parts = []
     buffer = []
-    total = 0
+    written = len(ARRAY_OPEN)
 
-    for chunk in chunks:
-        size = len(json.dumps(chunk))
-        if total + size > max_chars and buffer:
+    for item in items:
+        if buffer and projected_size(written, len(buffer), item) > max_bytes:
             parts.append(buffer)
             buffer = []
-            total = 0
-        buffer.append(chunk)
-        total += size
+            written = len(ARRAY_OPEN)
+        written += len(FIRST_SEP if not buffer else NEXT_SEP) + len(item)
+        buffer.append(item)
 
     if buffer:
         parts.append(buffer)
 
     return parts
 
+# ----------------------------------------
+# Encode a batch of chunks → [(domain, bytes, chars, tokens), ...]
+# chars/tokens are content totals for the split manifest; tokens are
+# batch-counted with the given tokenizer spec (None = not counted)
+# ----------------------------------------
+def encode_batch(chunks: list, tokenizer: str | None = None) -> list:
+    contents = [chunk.get("content", "") for chunk in chunks]
+    tokens = get_token_counter(tokenizer).count_many(contents) if tokenizer else [None] * len(chunks)
+    return [
+        (chunk_domain(chunk), encode_chunk(chunk), len(content), n)
+        for chunk, content, n in zip(chunks, contents, tokens)
+    ]
+
+# Group an iterable into lists of batch_size
+def _batches(chunks, batch_size: int):
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# ----------------------------------------
+# Yield (domain, encoded chunk, chars, tokens) in input order
+# With workers > 1, batches are serialized in a process pool with a
+# bounded number in flight so memory stays flat
+# ----------------------------------------
+def encode_stream(chunks, workers: int = 0, batch_size: int = ENCODE_BATCH_SIZE, tokenizer: str | None = None):
+    if workers <= 1:
+        for batch in _batches(chunks, batch_size):
+            yield from encode_batch(batch, tokenizer)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for batch in _batches(chunks, batch_size):
+            pending.append(pool.submit(encode_batch, batch, tokenizer))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+# ----------------------------------------
+# Bounded pool of single-thread write lanes
+# Every file op for a domain goes to the same lane, so writes to one file
+# stay in order while different domains write concurrently
+# ----------------------------------------
+class WriteLanes:
+    def __init__(self, threads: int, max_pending: int = 64):
+        self._lanes = [ThreadPoolExecutor(max_workers=1) for _ in range(threads)]
+        self._pending = deque()
+        self.max_pending = max_pending
+        self.errors = {}
+
+    def submit(self, domain: str, fn, *args):
+        lane = self._lanes[zlib.crc32(domain.encode("utf-8")) % len(self._lanes)]
+        self._pending.append((domain, lane.submit(fn, *args)))
+        while len(self._pending) > self.max_pending:
+            self._reap(*self._pending.popleft())
+
+    def _reap(self, domain: str, future):
+        try:
+            future.result()
+        except Exception as e:
+            self.errors.setdefault(domain, e)
+
+    # Wait for every queued write and stop the lanes
+    def drain(self):
+        while self._pending:
+            self._reap(*self._pending.popleft())
+        for lane in self._lanes:
+            lane.shutdown(wait=True)
+
+# Run a file op immediately (serial mode)
+def _run_now(fn, *args):
+    fn(*args)
+
+# ----------------------------------------
+# One part file written as raw bytes (same layout as json.dump indent=2)
+# Written to <name>.tmp and renamed on commit, so a crash never leaves
+# a half-written .json behind for validate_json_output.py to reject.
+# Bytes are buffered and flushed in blocks through `run` (a lane or _run_now).
+# Content totals and a sha256 of the bytes are kept for the split manifest.
+# ----------------------------------------
+class PartFile:
+    def __init__(self, path: Path, run=_run_now):
+        self.path = path
+        self.final_path = path
+        self.tmp_path = path.with_name(path.name + ".tmp")
+        self.count = 0
+        self.chars = 0
+        self.tokens = 0
+        self.written = len(ARRAY_OPEN)
+        self._hash = hashlib.sha256()
+        self._run = run
+        self._buf = [ARRAY_OPEN]
+        self._buffered = len(ARRAY_OPEN)
+        self._fh = None
+        self.committed = False
+
+    def fits(self, item: bytes, max_bytes: int) -> bool:
+        return self.count == 0 or projected_size(self.written, self.count, item) <= max_bytes
+
+    def write(self, item: bytes, chars: int = 0, tokens: int | None = None):
+        self.chars += chars
+        self.tokens = None if tokens is None or self.tokens is None else self.tokens + tokens
+        sep = FIRST_SEP if self.count == 0 else NEXT_SEP
+        self._buf.append(sep)
+        self._buf.append(item)
+        self._buffered += len(sep) + len(item)
+        self.written += len(sep) + len(item)
+        self.count += 1
+        if self._buffered >= WRITE_BUFFER_BYTES:
+            self._flush()
+
+    def _flush(self):
+        data = b"".join(self._buf)
+        self._buf = []
+        self._buffered = 0
+        self._hash.update(data)
+        self._run(self._append, data)
+
+    # File ops below only ever run on this part's lane (or inline)
+    def _append(self, data: bytes):
+        if self._fh is None:
+            self._fh = open(self.tmp_path, "wb")
+        self._fh.write(data)
+
+    def _finish(self):
+        if self._fh is None:
+            self._fh = open(self.tmp_path, "wb")
+        self._fh.close()
+
+    def close(self) -> int:
+        tail = ARRAY_CLOSE if self.count else b"]"
+        self._buf.append(tail)
+        self.written += len(tail)
+        self._flush()
+        self._run(self._finish)
+        return self.written
+
+    def _replace(self):
+        os.replace(self.tmp_path, self.final_path)
+        self.committed = True
+
+    # Atomically move the finished temp file to its final name
+    def commit(self, final_path: Path | None = None):
+        self.final_path = final_path or self.path
+        self._run(self._replace)
+
+    # Remove whatever this part left on disk (call once its writes have stopped)
+    def discard(self):
+        if self._fh is not None:
+            try:
+                self._fh.close()
+            except OSError:
+                pass
+            self._fh = None
+        self.tmp_path.unlink(missing_ok=True)
+        if self.committed:
+            self.final_path.unlink(missing_ok=True)
+            self.committed = False
+
+    # Manifest entry for the committed file (call after its writes have finished)
+    def manifest_entry(self) -> dict:
+        return manifest_entry(self.final_path, self.count, self.chars, self.tokens, self._hash.hexdigest())
+
+# Write a list of encoded chunks to one part file
+def write_part(path: Path, items: list) -> int:
+    part = PartFile(path)
+    for item in items:
+        part.write(item)
+    size = part.close()
+    part.commit()
+    return size
+
+# ----------------------------------------
+# Streaming per-domain writer
+# Rolls over to a new part file when the byte budget is reached,
+# so only open file handles (not chunk lists) are held in memory.
+# Parts stay as .tmp files until the domain is closed, because a single
+# part is renamed to the plain domain.json.
+# After the first failed file op the domain is marked failed: its remaining
+# ops (including the renames) are skipped, and discard() removes its files.
+# ----------------------------------------
+class DomainPartWriter:
+    def __init__(self, output_dir: Path, domain: str, max_bytes: int, lanes: WriteLanes | None = None):
+        self.output_dir = output_dir
+        self.domain = domain
+        self.max_bytes = max_bytes
+        self.error = None
+        run = (lambda fn, *args: lanes.submit(domain, fn, *args)) if lanes else _run_now
+        self._run = lambda fn, *args: run(self._guarded, fn, *args)
+        self._parts = []
+
+    # Runs on the domain's lane (or inline); the first failure sticks
+    def _guarded(self, fn, *args):
+        if self.error is not None:
+            return
+        try:
+            fn(*args)
+        except Exception as e:
+            self.error = e
+            raise
+
+    @property
+    def parts(self) -> int:
+        return len(self._parts)
+
+    def _part_path(self, i: int) -> Path:
+        return self.output_dir / f"{self.domain}_part{i}.json"
+
+    def write(self, chunk: dict):
+        self.write_encoded(encode_chunk(chunk), len(chunk.get("content", "")))
+
+    def write_encoded(self, item: bytes, chars: int = 0, tokens: int | None = None):
+        part = self._parts[-1] if self._parts else None
+        if part is None or not part.fits(item, self.max_bytes):
+            if part:
+                part.close()
+            part = PartFile(self._part_path(len(self._parts) + 1), self._run)
+            self._parts.append(part)
+            if projected_size(part.written, 0, item) > self.max_bytes:
+                logging.warning(f"Single chunk in {self.domain} exceeds {self.max_bytes} bytes on its own")
+        part.write(item, chars, tokens)
+
+    # Close the last part and commit all; a single part keeps the plain domain.json name
+    def close(self) -> list:
+        if not self._parts:
+            return []
+        self._parts[-1].close()
+        if len(self._parts) == 1:
+            final = self.output_dir / f"{self.domain}.json"
+            self._parts[0].commit(final)
+            return [final]
+        for part in self._parts:
+            part.commit()
+        return [part.path for part in self._parts]
+
+    # Manifest entries by file name for every committed part
+    def manifest_entries(self) -> dict:
+        return {part.final_path.name: part.manifest_entry() for part in self._parts}
+
+    # Remove every temp and committed file of this domain (after its writes have stopped)
+    def discard(self):
+        for part in self._parts:
+            part.discard()
+
+# ----------------------------------------
+# Stream chunks into per-domain part files with numbered suffixes if needed
+# serialize_workers > 1: encode chunks in a process pool
+# io_threads > 0: write files through a bounded pool of per-domain lanes
+# tokenizer: spec for manifest token totals (None = skip token counting)
+# ----------------------------------------
+def write_chunk_stream(chunks, output_dir: Path, max_bytes: int = MAX_BYTES_PER_FILE,
+                       serialize_workers: int = 0, io_threads: int = 0,
+                       tokenizer: str | None = TOKENIZER) -> dict:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if tokenizer:
+        try:
+            get_token_counter(tokenizer)
+        except Exception as e:
+            logging.warning(f"Token counter {tokenizer} unavailable, manifest will omit tokens: {str(e)}")
+            tokenizer = None
+
+    lanes = WriteLanes(io_threads) if io_threads > 0 else None
+    writers = {}
+    written = {}
+    failed = {}
+    completed = False
+
+    try:
+        for domain, item, chars, tokens in encode_stream(chunks, serialize_workers, tokenizer=tokenizer):
+            writer = writers.get(domain)
+            if writer is None:
+                writer = writers[domain] = DomainPartWriter(output_dir, domain, max_bytes, lanes)
+            writer.write_encoded(item, chars, tokens)
+
+        for domain, writer in writers.items():
+            try:
+                written[domain] = writer.close()
+            except Exception as e:
+                failed[domain] = e
+        completed = True
+    finally:
+        if lanes:
+            lanes.drain()
+        if not completed:
+            for writer in writers.values():
+                writer.discard()
+
+    for domain, writer in writers.items():
+        error = failed.get(domain) or writer.error or (lanes.errors.get(domain) if lanes else None)
+        if error:
+            # Never leave a partial domain behind: it would still be valid JSON
+            logging.error(f"Failed to write {domain} to disk, Error: {str(error)}")  # Log failure
+            writer.discard()
+            written.pop(domain, None)
+            continue
+        for path in written[domain]:
+            logging.info(f"Successfully wrote {path.name} to disk")  # Log successful write
+
+    # Files are all committed once the lanes have drained, so sizes/mtimes are final
+    entries = {}
+    for domain in written:
+        entries.update(writers[domain].manifest_entries())
+    manifest = write_split_manifest(output_dir, entries, tokenizer)
+    logging.info(f"Wrote split manifest for {len(entries)} file(s) → {manifest}")
+
+    return written
+
 # Write split parts to disk with numbered suffixes if needed
 def write_chunks(grouped_chunks: dict, output_dir: Path):
     output_dir.mkdir(parents=True, exist_ok=True)
 
     for domain, chunks in grouped_chunks.items():
-        parts = split_large_file(chunks, MAX_CHARS_PER_FILE)
+        parts = split_large_file([encode_chunk(c) for c in chunks], MAX_BYTES_PER_FILE)
 
         for i, part in enumerate(parts, 1):
             suffix = f"_part{i}" if len(parts) > 1 else ""
@@ -81,30 +420,43 @@ def write_chunks(grouped_chunks: dict, output_dir: Path):
             out_path = output_dir / filename
 
             try:
-                with open(out_path, "w", encoding="utf-8") as f:
-                    json.dump(part, f, indent=2, ensure_ascii=False)
+                write_part(out_path, part)
                 logging.info(f"Successfully wrote {filename} to disk")  # Log successful write
             except Exception as e:
                 logging.error(f"Failed to write {filename} to disk, Error: {str(e)}")  # Log failure
 
+# Shared CLI options for concurrent writing (also used by run_pipeline.py)
+def add_split_args(parser: argparse.ArgumentParser):
+    parser.add_argument("--serialize-workers", type=int, default=0,
+                        help="Serialize chunks in N worker processes (default: 0 = in-process)")
+    parser.add_argument("--io-threads", type=int, default=0,
+                        help="Write part files through N I/O threads (default: 0 = inline)")
+    parser.add_argument("--no-token-counts", action="store_true",
+                        help="Skip per-file token totals in split/.split_manifest")
+
 # Main CLI entrypoint
 def main():
-    logging.info("Script started: split_large_json_files.py")  # Log when the script starts
-
     parser = argparse.ArgumentParser(description="Split large JSONs by domain slug.")
     parser.add_argument("--input", type=str, default=CLEAN_FULL_OUTPUT_FILE, help="Input cleaned file")
     parser.add_argument("--output", type=str, default=SPLIT_DIR, help="Output directory for split files")
+    add_split_args(parser)
     args = parser.parse_args()
 
+    setup_logging()
+    logging.info("Script started: split_large_json_files.py")  # Log when the script starts
+    settings.require("split")
+
+
     input_path = Path(args.input)
     output_dir = Path(args.output)
 
     try:
-        chunks = json.loads(input_path.read_text(encoding="utf-8"))
-        grouped = chunk_by_domain(chunks)
-        write_chunks(grouped, output_dir)
+        # Stream chunks straight into per-domain part files (constant memory)
+        written = write_chunk_stream(iter_chunks(input_path), output_dir,
+                                     serialize_workers=args.serialize_workers, io_threads=args.io_threads,
+                                     tokenizer=None if args.no_token_counts else TOKENIZER)
         logging.info(f"Script finished successfully: split_large_json_files.py")  # Log success
-        print(f"[✅] Split into {len(grouped)} domain file(s) → {output_dir}")
+        print(f"[✅] Split into {len(written)} domain file(s) → {output_dir}")
     except Exception as e:
         logging.error(f"Script failed: split_large_json_files.py, Error: {str(e)}")  # Log failure
         print(f"[❌] Error: {str(e)}")  # Print the error to the console
@@ -0,0 +1,65 @@
+# scripts/split_manifest.py
+
+# ----------------------------------------
+# Split Output Manifest
+# ----------------------------------------
+# Sidecar written by the split stage next to the part files:
+#   split/.split_manifest
+# Per file: byte size, mtime, chunk count, content char and token
+# totals, and sha256 of the file bytes.
+# Readers (check_split_file_sizes.py) trust an entry only while the
+# file's size and mtime still match; otherwise they re-count the file.
+# The name has no .json suffix so *.json globs over split/ skip it.
+# ----------------------------------------
+
+import os
+import json
+from pathlib import Path
+
+SPLIT_MANIFEST_NAME = ".split_manifest"
+
+# Bump when the entry layout changes so old manifests are ignored
+SPLIT_MANIFEST_VERSION = 1
+
+def manifest_path(directory: Path) -> Path:
+    return Path(directory) / SPLIT_MANIFEST_NAME
+
+# ----------------------------------------
+# Build one entry from a committed file and its writer-side totals
+# ----------------------------------------
+def manifest_entry(path: Path, chunks: int, chars: int, tokens: int | None, sha256: str) -> dict:
+    st = os.stat(path)
+    return {
+        "bytes": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "chunks": chunks,
+        "chars": chars,
+        "tokens": tokens,
+        "sha256": sha256
+    }
+
+# Write the manifest atomically (temp file + rename)
+def write_split_manifest(directory: Path, files: dict, tokenizer: str | None = None) -> Path:
+    path = manifest_path(directory)
+    tmp = path.with_name(path.name + ".tmp")
+    data = {"version": SPLIT_MANIFEST_VERSION, "tokenizer": tokenizer, "files": files}
+    tmp.write_text(json.dumps(data, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+# ----------------------------------------
+# Load manifest entries by file name ({} if missing, unreadable or outdated)
+# ----------------------------------------
+def load_split_manifest(directory: Path) -> dict:
+    path = manifest_path(directory)
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if data.get("version") != SPLIT_MANIFEST_VERSION:
+        return {}
+    return data.get("files", {})
+
+# An entry is fresh while the file on disk has the same size and mtime
+def is_fresh(entry: dict | None, st: os.stat_result) -> bool:
+    return bool(entry) and entry.get("bytes") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns
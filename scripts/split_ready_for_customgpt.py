@@ -11,10 +11,7 @@ from urllib.parse import urlparse
 # Import logging setup from config.py
 from config import setup_logging
 
-# Call the setup function to configure logging
-setup_logging()
-
-# Now you can use logging throughout the script
+# Logging is configured in main(), so importing this module has no side effects
 import logging
 
 # ----------------------------------------
@@ -30,7 +27,7 @@ import logging
 
 # Enable relative import of project config
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from config import CLEAN_FULL_OUTPUT_FILE as INPUT_FILE, SPLIT_DIR as OUTPUT_DIR
+from config import settings, CLEAN_FULL_OUTPUT_FILE as INPUT_FILE, SPLIT_DIR as OUTPUT_DIR
 
 def normalize(name: str) -> str:
     """
@@ -48,35 +45,18 @@ def normalize(name: str) -> str:
     name = re.sub(r"_pdf$", "", name)
     return re.sub(r"_+", "_", name).strip("_")
 
-# Load cleaned merged chunk list from full output file
-chunks = json.loads(INPUT_FILE.read_text(encoding="utf-8"))
-
 # Group chunks by normalized domain (project root)
 def get_group_key(chunk):
     source = chunk.get("source", "")
     parsed = urlparse(source)
     return parsed.netloc or "unknown_source"
 
-groups = defaultdict(list)
-for chunk in chunks:
-    group_key = get_group_key(chunk)
-    groups[group_key].append({
-        "source": chunk["source"],
-        "content": chunk["content"],
-        "metadata": chunk.get("metadata", {})
-    })
-
-# Ensure output directory exists
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-
-# Write one .json file per group (by normalized domain name)
-for group_key, entries in groups.items():
-    out_path = OUTPUT_DIR / f"{normalize(group_key)}.json"
-    out_path.write_text(json.dumps(entries, ensure_ascii=False, indent=2))
-
 def main():
+    setup_logging()
     logging.info("Script started: split_ready_for_customgpt.py")
     try:
+        settings.require("split-customgpt")
+
         # Load cleaned merged chunk list from full output file
         chunks = json.loads(INPUT_FILE.read_text(encoding="utf-8"))
 
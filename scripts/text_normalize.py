@@ -0,0 +1,52 @@
+# scripts/text_normalize.py
+
+# ----------------------------------------
+# Shared Text Normalization
+# ----------------------------------------
+# One place for the text clean-up used by both pipeline stages:
+# - clean_raw_text:   ingest (smart_ingest.py) — HTML entities, soft
+#                     hyphens, whitespace collapse
+# - clean_chunk_text: clean stage (clean_json_chunks.py) — markdown
+#                     images + inline HTML tags, whitespace collapse
+# Patterns are compiled once and skipped when they cannot match, and
+# whitespace is collapsed with str.split/join (the same characters as \s).
+# Soft hyphens use str.replace: str.translate with a non-ASCII table
+# falls back to a per-character loop and is ~100x slower here.
+# ----------------------------------------
+
+import re
+import html
+
+# Markdown images, then inline HTML tags (order matters for overlapping markup)
+_MD_IMAGE = re.compile(r"!\[[^\]]*\]\([^)]+\)")
+_HTML_TAG = re.compile(r"<[^>]+>")
+
+# ----------------------------------------
+# Collapse any run of whitespace to one space and trim the ends
+# ----------------------------------------
+def collapse_whitespace(text: str) -> str:
+    return " ".join(text.split())
+
+# Remove HTML tags only (simple strip for raw .html ingestion)
+def strip_tags(text: str) -> str:
+    return _HTML_TAG.sub("", text) if "<" in text else text
+
+# ----------------------------------------
+# Ingest-time cleanup of extracted page / entry text
+# ----------------------------------------
+def clean_raw_text(text: str) -> str:
+    if "&" in text:
+        text = html.unescape(text)
+    # \xa0 and \n need no replace: split() treats them as whitespace
+    return collapse_whitespace(text.replace("\u00ad", ""))
+
+# ----------------------------------------
+# Clean-stage cleanup: drop markdown images and inline HTML tags
+# Each regex pass is skipped when its marker character is absent
+# ----------------------------------------
+def clean_chunk_text(text: str) -> str:
+    if "![" in text:
+        text = _MD_IMAGE.sub("", text)
+    if "<" in text:
+        text = _HTML_TAG.sub("", text)
+    return collapse_whitespace(text)
@@ -0,0 +1,110 @@
+# scripts/token_counter.py
+
+# ----------------------------------------
+# Pluggable Token Counters
+# ----------------------------------------
+# Used by the chunkers to size windows in real model tokens.
+# Spec strings (config TOKENIZER or --tokenizer):
+#   whitespace                 → len(text.split()) (legacy estimate)
+#   tiktoken:<encoding>        → e.g. tiktoken:cl100k_base
+#   file:<path/tokenizer.json> → local HuggingFace `tokenizers` file
+# Sentences are batch-encoded once per page and counts are cached,
+# so repeated headers/footers are only ever encoded once.
+# ----------------------------------------
+
+from pathlib import Path
+
+# Cap on cached sentence counts per process before the cache is reset
+MAX_CACHE_ENTRIES = 200_000
+
+# ----------------------------------------
+# Base counter: cache + batch lookup, subclasses implement _encode_batch
+# ----------------------------------------
+class TokenCounter:
+    name = "base"
+
+    def __init__(self):
+        self._cache = {}
+
+    def _encode_batch(self, texts: list) -> list:
+        raise NotImplementedError
+
+    # Count tokens for many texts, encoding only the ones not seen before
+    def count_many(self, texts: list) -> list:
+        cache = self._cache
+        missing = [t for t in dict.fromkeys(texts) if t not in cache]
+        if missing:
+            if len(cache) + len(missing) > MAX_CACHE_ENTRIES:
+                cache.clear()
+            cache.update(zip(missing, self._encode_batch(missing)))
+        return [cache[t] for t in texts]
+
+    def count(self, text: str) -> int:
+        return self.count_many([text])[0]
+
+class WhitespaceCounter(TokenCounter):
+    name = "whitespace"
+
+    # Splitting is cheaper than a dict lookup, so skip the cache entirely
+    def count_many(self, texts: list) -> list:
+        return [len(t.split()) for t in texts]
+
+class TiktokenCounter(TokenCounter):
+    def __init__(self, encoding: str):
+        super().__init__()
+        import tiktoken
+        self.name = f"tiktoken:{encoding}"
+        self._enc = tiktoken.get_encoding(encoding)
+
+    def _encode_batch(self, texts: list) -> list:
+        return [len(ids) for ids in self._enc.encode_ordinary_batch(texts)]
+
+class TokenizerFileCounter(TokenCounter):
+    def __init__(self, path: str):
+        super().__init__()
+        try:
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("file:<path> token counting requires `pip install tokenizers`") from e
+        self.name = f"file:{path}"
+        self._tok = Tokenizer.from_file(str(Path(path).expanduser()))
+
+    def _encode_batch(self, texts: list) -> list:
+        return [len(enc.ids) for enc in self._tok.encode_batch(texts, add_special_tokens=False)]
+
+# ----------------------------------------
+# Build a counter from a spec string
+# ----------------------------------------
+def build_token_counter(spec: str) -> TokenCounter:
+    kind, _, arg = spec.partition(":")
+    if kind == "whitespace":
+        return WhitespaceCounter()
+    if kind == "tiktoken":
+        return TiktokenCounter(arg or "cl100k_base")
+    if kind == "file" and arg:
+        return TokenizerFileCounter(arg)
+    raise ValueError(f"Unknown tokenizer spec: {spec!r} (expected whitespace, tiktoken:<enc> or file:<path>)")
+
+# One counter per spec per process (workers build their own on first use)
+_counters = {}
+
+def get_token_counter(spec: str) -> TokenCounter:
+    if spec not in _counters:
+        _counters[spec] = build_token_counter(spec)
+    return _counters[spec]
+
+# ----------------------------------------
+# Resolve the counter up front (before any worker starts) and fail with
+# an actionable message; tiktoken fetches its BPE file on first use, so
+# an offline machine would otherwise fail inside every worker
+# ----------------------------------------
+def require_token_counter(spec: str) -> TokenCounter:
+    try:
+        counter = get_token_counter(spec)
+        counter.count("warm-up")
+        return counter
+    except Exception as e:
+        hint = ("tiktoken downloads its encoding on first use: run once with network access, "
+                "point TIKTOKEN_CACHE_DIR at a cached copy, or " if spec.startswith("tiktoken:") else "")
+        raise RuntimeError(f"Token counter {spec!r} is unavailable ({type(e).__name__}: {e}). "
+                           f"{hint}set TOKENIZER=whitespace to size chunks by words instead") from e
@@ -4,73 +4,138 @@
 # Output JSON Validator
 # ----------------------------------------
 # Verifies that each .json file in the split/ directory:
-# - Is a valid JSON list
-# - Contains dicts with both "source" and "content" keys
+# - Is a valid JSON list (streamed, never loaded whole)
+# - Contains dicts matching the chunk schema:
+#     source: str, content: str, metadata: dict with
+#     url / title / doc_id: str or null, heading_path: list of str (optional)
 # - Can be parsed without crashing
+# Files are checked in parallel; each file stops at its first error.
+# A machine-readable JSON report can be written with --report.
 # If any file fails validation, process exits with code 1.
 # ----------------------------------------
 
 import json
 import sys
 import os
+import argparse
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 
 # Import logging setup from config.py
 from config import setup_logging
 
-# Call the setup function to configure logging
-setup_logging()
-
-# Now you can use logging throughout the script
+# Logging is configured in main(), so importing this module has no side effects
 import logging
 
 # Load SPLIT_DIR from project root
 sys.path.append(str(Path(__file__).resolve().parents[1]))
-from config import SPLIT_DIR as TARGET_DIR
+from config import settings, SPLIT_DIR as TARGET_DIR
+from chunk_stream import iter_json_array
+
+# Optional string-or-null metadata fields
+METADATA_STR_FIELDS = ("url", "title", "doc_id")
 
 # ----------------------------------------
-# Validate one directory of JSON files
+# Return an error message for one entry, or None if it is valid
 # ----------------------------------------
-def validate(directory: Path):
-    has_error = False
+def check_entry(entry) -> str | None:
+    if not isinstance(entry, dict):
+        return "entry is not a dict"
+    for key in ("source", "content"):
+        if key not in entry:
+            return f"missing required key '{key}'"
+        if not isinstance(entry[key], str):
+            return f"'{key}' is {type(entry[key]).__name__}, expected str"
 
+    metadata = entry.get("metadata")
+    if metadata is None:
+        return None
+    if not isinstance(metadata, dict):
+        return f"'metadata' is {type(metadata).__name__}, expected dict"
+    for key in METADATA_STR_FIELDS:
+        value = metadata.get(key)
+        if value is not None and not isinstance(value, str):
+            return f"'metadata.{key}' is {type(value).__name__}, expected str or null"
+    heading_path = metadata.get("heading_path")
+    if heading_path is not None and not (isinstance(heading_path, list) and all(isinstance(h, str) for h in heading_path)):
+        return "'metadata.heading_path' must be a list of str"
+    return None
+
+# ----------------------------------------
+# Validate a single file; stops at the first error
+# ----------------------------------------
+def validate_file(file: Path) -> dict:
+    result = {"file": file.name, "valid": True, "chunks": 0, "error": None, "entry": None}
+    try:
+        for i, entry in enumerate(iter_json_array(file)):
+            error = check_entry(entry)
+            if error:
+                result.update(valid=False, error=error, entry=i)
+                return result
+            result["chunks"] += 1
+    except (ValueError, OSError, UnicodeDecodeError) as e:
+        result.update(valid=False, error=str(e), entry=result["chunks"])
+    return result
+
+# ----------------------------------------
+# Validate one directory of JSON files
+# Returns the report dict; exits 1 if any file is invalid
+# ----------------------------------------
+def validate(directory: Path, workers: int = 0, report_path: Path | None = None) -> dict:
     logging.info(f"Validating chunk structure in: {directory}")
 
-    for file in directory.glob("*.json"):
-        try:
-            # Read file and load JSON
-            data = json.loads(file.read_text(encoding="utf-8"))
-
-            # Top-level object must be a list
-            if not isinstance(data, list):
-                raise ValueError("Top-level JSON object is not a list.")
-
-            # Each entry must be a dict with required fields
-            for i, entry in enumerate(data):
-                if not isinstance(entry, dict):
-                    raise ValueError(f"Entry {i} is not a dict.")
-                if "source" not in entry or "content" not in entry:
-                    raise ValueError(f"Missing required keys in entry {i}.")
-
-        except Exception as e:
-            logging.error(f"INVALID {file.name}: {e}")
-            has_error = True
+    files = sorted(directory.glob("*.json"))
+    workers = workers or os.cpu_count() or 1
+
+    if workers > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(files))) as pool:
+            results = list(pool.map(validate_file, files))
+    else:
+        results = [validate_file(file) for file in files]
+
+    for result in results:
+        if result["valid"]:
+            logging.info(f"VALID {result['file']}")
         else:
-            logging.info(f"VALID {file.name}")
+            logging.error(f"INVALID {result['file']}: entry {result['entry']}: {result['error']}")
 
-    if has_error:
+    invalid = [r for r in results if not r["valid"]]
+    report = {
+        "directory": str(directory),
+        "files": len(results),
+        "chunks": sum(r["chunks"] for r in results),
+        "invalid": len(invalid),
+        "valid": not invalid,
+        "results": results
+    }
+
+    if report_path:
+        Path(report_path).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        logging.info(f"Validation report → {report_path}")
+
+    if invalid:
         logging.error("Validation failed. Some files are malformed.")
         sys.exit(1)
     else:
         logging.info("All files passed schema validation.")
+    return report
 
 # ----------------------------------------
 # CLI entrypoint
 # ----------------------------------------
 def main():
+    parser = argparse.ArgumentParser(description="Validate split chunk files against the chunk schema.")
+    parser.add_argument("--input", type=str, default=TARGET_DIR, help="Directory with split .json files")
+    parser.add_argument("--workers", type=int, default=0, help="Parallel file checks (default: 0 = all CPU cores)")
+    parser.add_argument("--report", type=str, default=None, help="Write a JSON validation report to this path")
+    args = parser.parse_args()
+
+    setup_logging()
     logging.info("Script started: validate_json_output.py")
     try:
-        validate(TARGET_DIR)
+        settings.require("validate")
+
+        validate(Path(args.input), workers=args.workers, report_path=args.report)
         logging.info("Script finished successfully: validate_json_output.py")
     except Exception as e:
         logging.error(f"Script failed: validate_json_output.py, Error: {str(e)}")
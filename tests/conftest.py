@@ -0,0 +1,40 @@
+# tests/conftest.py
+
+# ----------------------------------------
+# Shared test setup
+# ----------------------------------------
+# - Puts the project root (config.py) and scripts/ on sys.path
+# - Points REPO_ROOT / OUTPUT_ROOT at a throwaway directory and sets a
+#   dummy APIFY_TOKEN before any pipeline module is imported
+# - `apify` fixture: a local Apify API stand-in (see fake_apify.py)
+# ----------------------------------------
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path[:0] = [str(ROOT), str(ROOT / "scripts"), str(Path(__file__).resolve().parent)]
+
+_sandbox = Path(tempfile.mkdtemp(prefix="ragfmt-tests-"))
+os.environ["REPO_ROOT"] = str(_sandbox / "repo")
+os.environ["OUTPUT_ROOT"] = str(_sandbox / "output")
+os.environ["APIFY_TOKEN"] = "test-token"
+(_sandbox / "repo" / "ingestion_source").mkdir(parents=True)
+
+from fake_apify import FakeApify
+
+@pytest.fixture
+def apify(monkeypatch, tmp_path):
+    import ragformatter
+    from config import settings
+
+    with FakeApify() as server:
+        monkeypatch.setattr(ragformatter, "APIFY_API_BASE", server.url)
+        # Fresh REPO_ROOT (and so ingestion_source/) per test
+        monkeypatch.setattr(settings, "REPO_ROOT", tmp_path)
+        (tmp_path / "ingestion_source").mkdir()
+        yield server
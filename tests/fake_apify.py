@@ -0,0 +1,135 @@
+# tests/fake_apify.py
+
+# ----------------------------------------
+# Local stand-in for the Apify endpoints ragformatter.py calls
+# ----------------------------------------
+# - POST /acts/<actor>/runs              start a run (dataset from startUrls)
+# - GET  /actor-runs/<id>                run status; RUNNING for `polls_to_finish` polls
+# - GET  /datasets/<id>                  itemCount (optionally lagging)
+# - GET  /datasets/<id>/items            format=jsonl pages by offset/limit
+# Every request is recorded, queued 503s can be injected per path, and
+# the number of runs in flight at once is tracked.
+# ----------------------------------------
+
+import json
+import threading
+from collections import defaultdict, deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+class FakeApify:
+    def __init__(self, polls_to_finish: int = 2, items_per_run: int = 7):
+        self.polls_to_finish = polls_to_finish
+        self.items_per_run = items_per_run
+        self.datasets = {}
+        self.item_counts = {}
+        self.runs = {}
+        self.run_inputs = []
+        self.final_status = {}
+        self.failures = defaultdict(deque)
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    # Items a crawl of `domain` returns
+    @staticmethod
+    def items_for(domain: str, n: int) -> list:
+        return [{"url": f"{domain.rstrip('/')}/page{i}", "text": f"Page {i} of {domain}", "markdown": f"# Page {i}"}
+                for i in range(n)]
+
+    def add_dataset(self, dataset_id: str, items: list, item_count: int | None = None):
+        self.datasets[dataset_id] = items
+        self.item_counts[dataset_id] = len(items) if item_count is None else item_count
+
+    # Answer the next `times` requests to `path` with `status`
+    def fail(self, path: str, status: int = 503, times: int = 1):
+        self.failures[path].extend([status] * times)
+
+    def item_requests(self, dataset_id: str) -> list:
+        return [int(q["offset"][0]) for method, path, q in self.requests
+                if path == f"/datasets/{dataset_id}/items"]
+
+    def _start_run(self, payload: dict) -> dict:
+        domain = payload["startUrls"][0]["url"]
+        with self._lock:
+            self.run_inputs.append(payload)
+            run_id = f"run{len(self.runs)}"
+            dataset_id = f"ds{len(self.runs)}"
+            self.add_dataset(dataset_id, self.items_for(domain, self.items_per_run))
+            self.runs[run_id] = {"id": run_id, "status": "RUNNING", "defaultDatasetId": dataset_id,
+                                 "domain": domain, "polls": 0}
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return dict(self.runs[run_id])
+
+    def _poll_run(self, run_id: str) -> dict:
+        with self._lock:
+            run = self.runs[run_id]
+            run["polls"] += 1
+            if run["status"] == "RUNNING" and run["polls"] >= self.polls_to_finish:
+                run["status"] = self.final_status.get(run["domain"], "SUCCEEDED")
+                self.in_flight -= 1
+            return dict(run)
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _send(self, status: int, body: bytes = b"", content_type: str = "application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _route(self, method: str):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                with fake._lock:
+                    fake.requests.append((method, url.path, query))
+                    queued = fake.failures.get(url.path)
+                    status = queued.popleft() if queued else None
+                if status:
+                    return self._send(status, b'{"error": "injected"}')
+
+                parts = url.path.strip("/").split("/")
+                if method == "POST" and parts[0] == "acts" and parts[-1] == "runs":
+                    return self._send(201, json.dumps({"data": fake._start_run(json.loads(body))}).encode())
+                if method == "GET" and parts[0] == "actor-runs":
+                    return self._send(200, json.dumps({"data": fake._poll_run(parts[1])}).encode())
+                if method == "GET" and parts[0] == "datasets" and len(parts) == 2:
+                    count = fake.item_counts[parts[1]]
+                    return self._send(200, json.dumps({"data": {"id": parts[1], "itemCount": count}}).encode())
+                if method == "GET" and parts[0] == "datasets" and parts[2] == "items":
+                    offset = int(query.get("offset", ["0"])[0])
+                    limit = int(query.get("limit", ["1000"])[0])
+                    page = fake.datasets[parts[1]][offset:offset + limit]
+                    lines = "".join(json.dumps(item) + "\n" for item in page)
+                    return self._send(200, lines.encode(), "application/jsonl")
+                return self._send(404)
+
+            def do_GET(self):
+                self._route("GET")
+
+            def do_POST(self):
+                self._route("POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,104 @@
+# tests/test_batch_crawl.py
+
+# ----------------------------------------
+# Batch crawling (ragformatter --batch) against a local Apify stand-in:
+# the concurrency cap on actor runs, polling backoff, a run that ends
+# FAILED, and the per-domain dataset download and output files
+# ----------------------------------------
+
+import json
+import time
+import asyncio
+import argparse
+import functools
+import types
+
+import pytest
+
+import ragformatter
+from ragformatter import crawl_batch, crawl_output_path, run_batch, wait_for_run
+
+DOMAINS = [f"https://docs{i}.example.com/" for i in range(6)]
+
+@pytest.fixture
+def fast_polls(monkeypatch):
+    # Short backoff so runs that stay RUNNING are re-polled quickly
+    monkeypatch.setattr(ragformatter, "wait_for_run",
+                        functools.partial(wait_for_run, wait_secs=0, initial=0.01, cap=0.02))
+
+@pytest.fixture
+def pipeline_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ragformatter, "run_clean_pipeline", lambda: calls.append(True))
+    return calls
+
+def test_caps_runs_in_flight(apify, fast_polls):
+    apify.polls_to_finish = 3
+    results = asyncio.run(crawl_batch([(d, []) for d in DOMAINS], max_runs=2, pipeline="none", page_size=3))
+
+    assert all(not isinstance(r, BaseException) for r in results.values())
+    assert apify.max_in_flight == 2
+    assert len(apify.runs) == len(DOMAINS)
+
+def test_downloads_each_domain_to_its_own_file(apify, fast_polls):
+    apify.items_per_run = 8
+    results = asyncio.run(crawl_batch([(d, ["guides"]) for d in DOMAINS[:3]], max_runs=3,
+                                      pipeline="none", page_size=3, download_workers=2))
+
+    for domain in DOMAINS[:3]:
+        output = crawl_output_path(domain)
+        assert results[domain] == output
+        assert json.loads(output.read_text()) == apify.items_for(domain, 8)
+        assert not output.with_name(output.name + ".parts").exists()
+
+    # Each run's dataset is paged separately (8 items in pages of 3)
+    for run in apify.runs.values():
+        assert sorted(apify.item_requests(run["defaultDatasetId"])) == [0, 3, 6]
+
+    # Path filters become include globs on the run input
+    assert sorted(p["includeUrlGlobs"][0]["glob"] for p in apify.run_inputs) == \
+        sorted(f"{d.rstrip('/')}/guides**" for d in DOMAINS[:3])
+
+def test_failed_run_is_reported_per_domain(apify, fast_polls):
+    apify.final_status[DOMAINS[1]] = "FAILED"
+    results = asyncio.run(crawl_batch([(d, []) for d in DOMAINS[:3]], max_runs=3, pipeline="none"))
+
+    assert isinstance(results[DOMAINS[1]], RuntimeError)
+    assert "FAILED" in str(results[DOMAINS[1]])
+    assert not crawl_output_path(DOMAINS[1]).exists()
+    assert crawl_output_path(DOMAINS[0]).exists() and crawl_output_path(DOMAINS[2]).exists()
+
+def test_run_batch_returns_failures_and_runs_pipeline_once(apify, fast_polls, pipeline_calls, tmp_path):
+    apify.final_status[DOMAINS[0]] = "ABORTED"
+    batch = tmp_path / "sites.txt"
+    batch.write_text("# sites\n" + "\n".join(f"{d} guides  # docs" for d in DOMAINS[:3]) + "\n")
+    args = argparse.Namespace(batch=str(batch), max_runs=2, pipeline="end", page_size=5,
+                              download_workers=2, deadline=30)
+
+    assert run_batch(args) == 1
+    assert pipeline_calls == [True]
+
+def test_pipeline_each_runs_after_every_dataset(apify, fast_polls, pipeline_calls):
+    asyncio.run(crawl_batch([(d, []) for d in DOMAINS[:3]], max_runs=3, pipeline="each"))
+    assert len(pipeline_calls) == 3
+
+def test_backs_off_while_the_server_answers_early(apify, monkeypatch):
+    apify.polls_to_finish = 6
+    run_id = apify._start_run({"startUrls": [{"url": DOMAINS[0]}]})["id"]
+    sleeps = []
+    clock = types.SimpleNamespace(monotonic=time.monotonic, sleep=sleeps.append)
+    monkeypatch.setattr(ragformatter, "time", clock)
+
+    data = wait_for_run(run_id, wait_secs=60, initial=2, cap=10, deadline_secs=0)
+
+    assert data["status"] == "SUCCEEDED"
+    # Five early RUNNING answers: exponential delays capped at 10s
+    assert sleeps == [2, 4, 8, 10, 10]
+    waits = [q.get("waitForFinish") for _, path, q in apify.requests if path.startswith("/actor-runs/")]
+    assert waits == [["60"]] * 6
+
+def test_deadline_raises_timeout(apify, fast_polls):
+    apify.polls_to_finish = 10 ** 6
+    run_id = apify._start_run({"startUrls": [{"url": DOMAINS[0]}]})["id"]
+    with pytest.raises(TimeoutError):
+        wait_for_run(run_id, wait_secs=0, initial=0.01, cap=0.02, deadline_secs=0.2)
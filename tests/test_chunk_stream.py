@@ -0,0 +1,37 @@
+# tests/test_chunk_stream.py
+
+# ----------------------------------------
+# Incremental JSON-array reading (chunk_stream.iter_json_array) and the
+# split-file validator built on it: only whitespace may follow the array
+# ----------------------------------------
+
+import json
+
+import pytest
+
+from chunk_stream import iter_json_array
+from validate_json_output import validate_file
+
+CHUNK = {"source": "https://docs.example.com/a", "content": "Some text", "metadata": {"url": "https://docs.example.com/a", "title": "a"}}
+
+def write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return path
+
+@pytest.mark.parametrize("block_chars", [1, 7, 1 << 20])
+def test_reads_array_with_trailing_whitespace(tmp_path, block_chars):
+    path = write(tmp_path / "ok.json", json.dumps([CHUNK, CHUNK], indent=2) + "\n\n  ")
+    assert list(iter_json_array(path, block_chars)) == [CHUNK, CHUNK]
+
+@pytest.mark.parametrize("trailer", [" trailing", "[]", "\n]", ","])
+@pytest.mark.parametrize("block_chars", [1, 7, 1 << 20])
+def test_rejects_data_after_the_array(tmp_path, trailer, block_chars):
+    path = write(tmp_path / "bad.json", json.dumps([CHUNK]) + trailer)
+    with pytest.raises(ValueError, match="Extra data"):
+        list(iter_json_array(path, block_chars))
+
+def test_validator_flags_trailing_data(tmp_path):
+    path = write(tmp_path / "docs-example-com.json", json.dumps([CHUNK], indent=2) + "[]")
+    result = validate_file(path)
+    assert not result["valid"]
+    assert "Extra data" in result["error"]
@@ -0,0 +1,40 @@
+# tests/test_config.py
+
+# ----------------------------------------
+# Lazy settings (config.py): importing a stage, resolving its paths or
+# printing its --help must not create anything under OUTPUT_ROOT, and
+# every stage command has a STAGE_REQUIREMENTS entry
+# ----------------------------------------
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+from config import Settings
+
+def test_resolving_paths_creates_nothing(monkeypatch, tmp_path):
+    monkeypatch.setenv("OUTPUT_ROOT", str(tmp_path / "output"))
+    settings = Settings()
+
+    for name in ("OUTPUT_ROOT", "FULL_OUTPUT_NDJSON", "INGEST_CACHE_DIR", "SPLIT_DIR", "OCR_QUEUE_FILE"):
+        getattr(settings, name)
+
+    assert not (tmp_path / "output").exists()
+
+@pytest.mark.parametrize("command", ["ingest", "split", "process", "check", "validate"])
+def test_help_leaves_output_root_alone(tmp_path, command):
+    env = dict(os.environ, OUTPUT_ROOT=str(tmp_path / "output"), TOKENIZER="whitespace")
+    result = subprocess.run([sys.executable, str(ROOT / "scripts" / "ragfmt.py"), command, "--help"],
+                            env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+    assert not (tmp_path / "output").exists()
+
+def test_every_stage_command_has_requirements():
+    from config import STAGE_REQUIREMENTS
+    from ragfmt import COMMANDS
+
+    assert set(COMMANDS) - {"bench"} == set(STAGE_REQUIREMENTS)
@@ -0,0 +1,140 @@
+# tests/test_dataset_download.py
+
+# ----------------------------------------
+# Paginated dataset download (ragformatter.download_dataset) against a
+# local Apify stand-in: pagination, a lagging itemCount, retry after a
+# 503 and resume from pages already on disk (same page size only)
+# ----------------------------------------
+
+import json
+
+import ragformatter
+from config import settings
+from ragformatter import assemble_parts, crawl_output_path, download_dataset, download_page
+
+def read_json(path):
+    return json.loads(path.read_text(encoding="utf-8"))
+
+def test_pages_through_the_dataset(apify, tmp_path):
+    items = apify.items_for("https://docs.example.com", 10)
+    apify.add_dataset("ds", items)
+    output = tmp_path / "docs_example_com_crawl.json"
+
+    download_dataset("ds", output, page_size=3, workers=2)
+
+    assert read_json(output) == items
+    assert sorted(apify.item_requests("ds")) == [0, 3, 6, 9]
+    assert all(q["format"] == ["jsonl"] and q["limit"] == ["3"]
+               for _, path, q in apify.requests if path.endswith("/items"))
+    assert not (tmp_path / "docs_example_com_crawl.json.parts").exists()
+
+def test_reads_past_a_lagging_item_count(apify, tmp_path):
+    items = apify.items_for("https://docs.example.com", 10)
+    apify.add_dataset("ds", items, item_count=4)
+    output = tmp_path / "crawl.json"
+
+    download_dataset("ds", output, page_size=3, workers=2)
+
+    assert read_json(output) == items
+    # itemCount=4 → pages 0 and 3; both full, so 6 and 9 follow
+    assert sorted(apify.item_requests("ds")) == [0, 3, 6, 9]
+
+def test_empty_dataset_writes_an_empty_array(apify, tmp_path):
+    apify.add_dataset("ds", [])
+    output = tmp_path / "crawl.json"
+
+    download_dataset("ds", output, page_size=3)
+
+    assert read_json(output) == []
+
+def test_retries_a_page_after_503(apify, tmp_path):
+    items = apify.items_for("https://docs.example.com", 5)
+    apify.add_dataset("ds", items)
+    apify.fail("/datasets/ds")
+    apify.fail("/datasets/ds/items")
+    output = tmp_path / "crawl.json"
+
+    download_dataset("ds", output, page_size=3, workers=1)
+
+    assert read_json(output) == items
+    paths = [path for _, path, _ in apify.requests]
+    assert paths.count("/datasets/ds") == 2
+    assert len(apify.item_requests("ds")) == 3  # offset 0 twice, then 3
+
+def test_resumes_from_pages_on_disk(apify, tmp_path):
+    items = apify.items_for("https://docs.example.com", 7)
+    apify.add_dataset("ds", items)
+    output = tmp_path / "crawl.json"
+
+    # A previous run finished page 0 and died in the middle of page 3
+    parts = tmp_path / "crawl.json.parts"
+    parts.mkdir()
+    (parts / f"ds_p3_{0:012d}.jsonl").write_text("".join(json.dumps(i) + "\n" for i in items[:3]))
+    (parts / f"ds_p3_{3:012d}.jsonl.tmp").write_text(json.dumps(items[3])[:10])
+
+    download_dataset("ds", output, page_size=3, workers=2)
+
+    assert read_json(output) == items
+    assert sorted(apify.item_requests("ds")) == [3, 6]
+    assert not parts.exists()
+
+def test_ignores_pages_cut_at_another_page_size(apify, tmp_path):
+    items = apify.items_for("https://docs.example.com", 7)
+    apify.add_dataset("ds", items)
+    output = tmp_path / "crawl.json"
+
+    # A previous run with --page-size 2 finished its first two pages
+    parts = tmp_path / "crawl.json.parts"
+    parts.mkdir()
+    for offset in (0, 2):
+        page = items[offset:offset + 2]
+        (parts / f"ds_p2_{offset:012d}.jsonl").write_text("".join(json.dumps(i) + "\n" for i in page))
+
+    download_dataset("ds", output, page_size=3, workers=2)
+
+    assert read_json(output) == items
+    assert sorted(apify.item_requests("ds")) == [0, 3, 6]
+    assert not parts.exists()
+
+def test_download_page_terminates_the_last_line(apify, tmp_path, monkeypatch):
+    part = tmp_path / "page.jsonl"
+
+    class Response:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            pass
+
+        def raise_for_status(self):
+            pass
+
+        def iter_content(self, size):
+            yield b'{"a": 1}\n{"a"'
+            yield b': 2}'
+
+    class Session:
+        def get(self, *args, **kwargs):
+            return Response()
+
+    monkeypatch.setattr(ragformatter, "get_session", lambda: Session())
+    assert download_page("ds", 0, 10, part) == 2
+    assert part.read_bytes() == b'{"a": 1}\n{"a": 2}\n'
+
+def test_assemble_parts_by_output_suffix(tmp_path):
+    pages = []
+    for n in range(2):
+        page = tmp_path / f"p{n}.jsonl"
+        page.write_text(json.dumps({"n": n}) + "\n")
+        pages.append(page)
+
+    assemble_parts(pages, tmp_path / "out.jsonl")
+    assemble_parts(pages, tmp_path / "out.json")
+
+    assert (tmp_path / "out.jsonl").read_text() == '{"n": 0}\n{"n": 1}\n'
+    assert read_json(tmp_path / "out.json") == [{"n": 0}, {"n": 1}]
+
+def test_crawl_output_keeps_the_json_name(apify):
+    path = crawl_output_path("https://docs.example.com/")
+    assert path.name == "docs_example_com_crawl.json"
+    assert path.parent == settings.INGESTION_SOURCE